@@ -0,0 +1,35 @@
+"""Keyset (seek) pagination helpers shared by list endpoints."""
+
+import base64
+import binascii
+from typing import Any, Tuple
+
+import orjson
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last returned row as an opaque cursor."""
+
+    return base64.urlsafe_b64encode(orjson.dumps(list(values))).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[str, ...]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Every sort key paginated on is a string column. Raises ``ValueError``
+    when the cursor is malformed or does not hold exactly ``size`` strings.
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = orjson.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, orjson.JSONDecodeError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
+
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(value, str) for value in values)
+    ):
+        raise ValueError("Invalid pagination cursor")
+    return tuple(values)
@@ -1,14 +1,21 @@
 """Alerts endpoints."""
 
-from datetime import datetime, timedelta
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Request, HTTPException, Query
+import httpx
+import orjson
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, Query
+from pydantic import TypeAdapter
 
+from app.core.cache import cache_get, cache_set, cache_set_hash, get_redis, http_cache
+from app.core.circuit_breaker import CircuitBreakerError
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
+from app.core.singleflight import SingleFlight
 from app.models.schemas import AlertList, Alert, AlertSeverity
-from app.services.navitia_service import get_navitia_service
+from app.services.navitia_service import NavitiaService, get_navitia_service, parse_navitia_datetime
 
 
 router = APIRouter(
@@ -17,11 +24,98 @@ router = APIRouter(
     dependencies=[Depends(require_keycloak_token)],
 )
 
+# Correspondance effet Navitia (en minuscules) -> sévérité de l'alerte
+SEVERITY_MAP = {
+    "no_service": AlertSeverity.CRITICAL,
+    "blocked": AlertSeverity.CRITICAL,
+    "reduced_service": AlertSeverity.MAJOR,
+    "significant_delays": AlertSeverity.MAJOR,
+    "delays": AlertSeverity.WARNING,
+}
+
+# Nombre maximum de lignes / stations affectées renvoyées par alerte
+MAX_AFFECTED_OBJECTS = 10
+
+# Validateur compilé une seule fois pour toute la liste d'alertes
+_ALERT_LIST_ADAPTER = TypeAdapter(List[Alert])
+
+DISRUPTIONS_CACHE_KEY = "navitia:disruptions"
+DISRUPTIONS_MIN_TTL = 45
+DISRUPTIONS_MAX_TTL = 300
+DISRUPTIONS_STALE_TTL = 86400
+
+# Sur un cache manquant, une seule requête par clé recharge les perturbations
+_DISRUPTIONS_FLIGHT = SingleFlight()
+
+
+async def _load_disruptions(
+    navitia: NavitiaService,
+    since: Optional[datetime] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Récupère les perturbations Navitia en passant par le cache Redis.
+
+    Si ``since`` est fourni, Navitia ne renvoie que les perturbations encore
+    applicables après cette date (filtrage côté serveur). Les deux variantes
+    sont mises en cache sous des clés distinctes.
+
+    Retourne la liste des perturbations et un booléen indiquant si la copie
+    de secours (périmée) a été servie suite à une erreur Navitia.
+    """
+    if get_redis() is None:
+        return await navitia.get_disruptions(since=since), False
+
+    cache_key = f"{DISRUPTIONS_CACHE_KEY}:{'active' if since else 'all'}"
+    cached_body = await cache_get(cache_key)
+    if cached_body is not None:
+        return orjson.loads(cached_body), False
+
+    return await _DISRUPTIONS_FLIGHT.do(
+        cache_key, lambda: _refresh_disruptions(navitia, cache_key, since)
+    )
+
+
+async def _refresh_disruptions(
+    navitia: NavitiaService,
+    cache_key: str,
+    since: Optional[datetime],
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Recharge les perturbations depuis Navitia et met à jour le cache Redis."""
+    started = time.perf_counter()
+    try:
+        disruptions = await navitia.fetch_disruptions(since=since)
+    except (httpx.HTTPError, CircuitBreakerError, ValueError):
+        stale_body = await cache_get(f"{cache_key}:stale")
+        if stale_body is not None:
+            return orjson.loads(stale_body), True
+        return [], False
+    generation_seconds = time.perf_counter() - started
+
+    # Plus Navitia met de temps à répondre, plus la copie reste fraîche longtemps
+    fresh_ttl = int(min(DISRUPTIONS_MAX_TTL, max(DISRUPTIONS_MIN_TTL, generation_seconds * 30)))
+    generated_at = int(time.time())
+    body = orjson.dumps(disruptions)
+
+    await cache_set(cache_key, body, fresh_ttl)
+    await cache_set(f"{cache_key}:stale", body, DISRUPTIONS_STALE_TTL)
+    await cache_set_hash(
+        f"{cache_key}:meta",
+        {
+            "generated_at": generated_at,
+            "generation_ms": int(generation_seconds * 1000),
+            "stale_after": generated_at + fresh_ttl,
+        },
+        DISRUPTIONS_STALE_TTL,
+    )
+    return disruptions, False
+
 
 @router.get("/major", response_model=AlertList, summary="Get major alerts")
 @limiter.limit("100/minute")
+@http_cache(max_age=30, stale_while_revalidate=300)
 async def get_major_alerts(
     request: Request,
+    response: Response,
     active_only: bool = Query(True, description="Afficher uniquement les alertes actives"),
     severity: Optional[AlertSeverity] = Query(None, description="Filtrer par niveau de sévérité")
 ) -> AlertList:
@@ -34,25 +128,30 @@ async def get_major_alerts(
     """
     try:
         navitia = get_navitia_service()
+        now = datetime.now()
 
-        # Récupérer les perturbations depuis Navitia
-        disruptions = navitia.get_disruptions()
+        # Récupérer les perturbations depuis Navitia (ou le cache Redis).
+        # Le filtre active_only est délégué à Navitia via since ; la sévérité
+        # reste filtrée ici, l'API n'exposant pas de filtre sur l'effet.
+        disruptions, is_stale = await _load_disruptions(navitia, since=now if active_only else None)
+        if is_stale:
+            response.headers["X-Cache"] = "STALE"
 
-        alerts = []
-        now = datetime.now()
+        alerts: List[Dict[str, Any]] = []
+
+        # Liaisons locales pour la boucle chaude
+        append_alert = alerts.append
+        severity_for = SEVERITY_MAP.get
+        parse_dt = parse_navitia_datetime
+        info = AlertSeverity.INFO
 
         for idx, disruption in enumerate(disruptions):
-            # Déterminer la sévérité
-            severity_value = AlertSeverity.INFO
-            severity_obj = disruption.get("severity", {})
-            impact = severity_obj.get("effect", "").lower() if isinstance(severity_obj, dict) else ""
+            get = disruption.get
 
-            if "blocked" in impact or "no_service" in impact:
-                severity_value = AlertSeverity.CRITICAL
-            elif "reduced_service" in impact or "significant_delays" in impact:
-                severity_value = AlertSeverity.MAJOR
-            elif "delays" in impact:
-                severity_value = AlertSeverity.WARNING
+            # Déterminer la sévérité
+            severity_obj = get("severity") or {}
+            impact = (severity_obj.get("effect") or "").lower()
+            severity_value = severity_for(impact, info)
 
             # Filtrer par sévérité si demandé
             if severity and severity_value != severity:
@@ -64,14 +163,14 @@ async def get_major_alerts(
             description = ""
             
             # Essayer d'extraire le cause (peut être un objet avec 'label')
-            cause_obj = disruption.get("cause")
+            cause_obj = get("cause")
             if isinstance(cause_obj, dict):
                 title = cause_obj.get("label", "")
             elif isinstance(cause_obj, str):
                 title = cause_obj
             
             # Essayer d'extraire les messages
-            messages = disruption.get("messages", [])
+            messages = get("messages", [])
             if messages and isinstance(messages, list):
                 for msg in messages:
                     if isinstance(msg, dict):
@@ -82,54 +181,40 @@ async def get_major_alerts(
             
             # Fallback si pas de description
             if not description:
-                description = disruption.get("message", "Incident signalé sur le réseau")
+                description = get("message", "Incident signalé sur le réseau")
             
             # Fallback si pas de titre
             if not title:
-                title = severity_obj.get("name", "Perturbation en cours") if isinstance(severity_obj, dict) else "Perturbation en cours"
+                title = severity_obj.get("name", "Perturbation en cours")
+
+            # Dates Navitia (format: YYYYMMDDTHHMMSS)
+            updated_at = parse_dt(get("updated_at"))
 
             # Extraire les périodes d'application
-            application_periods = disruption.get("application_periods", [])
-            start_time = now
+            # Sans période, on retient la date de mise à jour plutôt que now :
+            # la réponse reste identique d'une requête à l'autre (cache possible)
+            application_periods = get("application_periods", [])
+            start_time = updated_at or now
             end_time = None
             is_active = True
 
             if application_periods:
                 first_period = application_periods[0]
-                begin = first_period.get("begin")
-                end = first_period.get("end")
-
-                if begin:
-                    try:
-                        # Format Navitia: YYYYMMDDTHHMMSS
-                        start_time = datetime.strptime(begin, "%Y%m%dT%H%M%S")
-                    except:
-                        try:
-                            start_time = datetime.fromisoformat(begin.replace("Z", "+00:00"))
-                        except:
-                            pass
-
-                if end:
-                    try:
-                        end_time = datetime.strptime(end, "%Y%m%dT%H%M%S")
-                        is_active = end_time > now
-                    except:
-                        try:
-                            end_time = datetime.fromisoformat(end.replace("Z", "+00:00"))
-                            is_active = end_time > now
-                        except:
-                            pass
+                start_time = parse_dt(first_period.get("begin")) or start_time
+                end_time = parse_dt(first_period.get("end"))
+                if end_time is not None:
+                    is_active = end_time > (now if end_time.tzinfo is None else now.astimezone())
 
             # Filtrer si on veut seulement les alertes actives
             if active_only and not is_active:
                 continue
 
-            # Extraire les lignes et stations affectées
-            affected_lines = []
-            affected_stations = []
+            # Extraire les lignes et stations affectées (sans doublon, dans
+            # l'ordre d'apparition, limitées à MAX_AFFECTED_OBJECTS chacune)
+            lines_seen: Dict[str, None] = {}
+            stations_seen: Dict[str, None] = {}
 
-            impacted_objects = disruption.get("impacted_objects", [])
-            for impacted in impacted_objects:
+            for impacted in get("impacted_objects", []):
                 # L'objet impacté peut avoir plusieurs formats
                 pt_object = impacted.get("pt_object", {})
                 
@@ -141,49 +226,37 @@ async def get_major_alerts(
                 # Extraire les lignes
                 if embedded_type == "line" or "line" in obj_id.lower():
                     line_obj = pt_object.get("line", {})
-                    if isinstance(line_obj, dict):
-                        line_name = line_obj.get("name", obj_name)
-                        if line_name:
-                            affected_lines.append(line_name)
-                    elif obj_name:
-                        affected_lines.append(obj_name)
+                    line_name = line_obj.get("name", obj_name) if isinstance(line_obj, dict) else obj_name
+                    if line_name and len(lines_seen) < MAX_AFFECTED_OBJECTS:
+                        lines_seen[line_name] = None
                 
                 # Extraire les stations
-                elif embedded_type in ["stop_area", "stop_point"]:
+                elif embedded_type in ("stop_area", "stop_point"):
                     stop_obj = pt_object.get(embedded_type, {})
-                    if isinstance(stop_obj, dict):
-                        station_name = stop_obj.get("name", obj_name)
-                        if station_name:
-                            affected_stations.append(station_name)
-                    elif obj_name:
-                        affected_stations.append(obj_name)
-
-            # Parser le updated_at de Navitia (format: YYYYMMDDTHHMMSS)
-            updated_at = start_time
-            updated_at_str = disruption.get("updated_at")
-            if updated_at_str:
-                try:
-                    # Format Navitia: 20251121T145715
-                    updated_at = datetime.strptime(updated_at_str, "%Y%m%dT%H%M%S")
-                except:
-                    # Si le parsing échoue, utiliser start_time
-                    updated_at = start_time
-
-            alerts.append(Alert(
-                id=disruption.get("id", f"ALERT_{idx}"),
-                title=title or "Perturbation",
-                description=description or "Incident signalé sur le réseau",
-                severity=severity_value,
-                affected_lines=list(set(affected_lines))[:10],  # Limiter à 10
-                affected_stations=list(set(affected_stations))[:10],
-                start_time=start_time,
-                end_time=end_time,
-                is_active=is_active,
-                created_at=start_time,
-                updated_at=updated_at
-            ))
-
-        return AlertList(alerts=alerts, total=len(alerts))
+                    station_name = stop_obj.get("name", obj_name) if isinstance(stop_obj, dict) else obj_name
+                    if station_name and len(stations_seen) < MAX_AFFECTED_OBJECTS:
+                        stations_seen[station_name] = None
+
+                if len(lines_seen) >= MAX_AFFECTED_OBJECTS and len(stations_seen) >= MAX_AFFECTED_OBJECTS:
+                    break
+
+            append_alert({
+                "id": get("id", f"ALERT_{idx}"),
+                "title": title or "Perturbation",
+                "description": description or "Incident signalé sur le réseau",
+                "severity": severity_value,
+                "affected_lines": list(lines_seen),
+                "affected_stations": list(stations_seen),
+                "start_time": start_time,
+                "end_time": end_time,
+                "is_active": is_active,
+                "created_at": start_time,
+                "updated_at": updated_at or start_time,
+            })
+
+        # Validation en un seul passage, puis construction sans revalider la liste
+        validated = _ALERT_LIST_ADAPTER.validate_python(alerts)
+        return AlertList.model_construct(alerts=validated, total=len(validated))
     except Exception as e:
         raise HTTPException(
             status_code=503,
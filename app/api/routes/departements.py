@@ -1,12 +1,16 @@
 """Departements endpoints."""
 
-from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy.orm import Session
+import time
 
+from fastapi import APIRouter, Depends, FastAPI, Request, Response, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import CACHE_TTL_LONG, CACHE_TTL_MEDIUM, http_cache
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
-from app.models.db import Departement as DBDepartement
+from app.models.db import Departement as DBDepartement, Region as DBRegion
 from app.models.schemas import DepartementList, Departement
 
 
@@ -17,31 +21,69 @@ router = APIRouter(
 )
 
 
+async def fetch_departements(db: AsyncSession) -> DepartementList:
+    """Charge tous les départements, triés par nom, avec le nom de leur région."""
+
+    # Une seule requête LEFT JOIN renvoyant des tuples : pas d'hydratation d'objets ORM
+    stmt = (
+        select(DBDepartement.code, DBDepartement.nom, DBDepartement.region_code, DBRegion.nom)
+        .outerjoin(DBRegion, DBDepartement.region_code == DBRegion.code)
+        .order_by(DBDepartement.nom)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    departements = [
+        # Départements issus de la DB : construction sans revalidation Pydantic
+        Departement.model_construct(
+            id=code,
+            name=nom,
+            code=code,
+            region_id=region_code,
+            region_name=region_nom
+        )
+        for code, nom, region_code, region_nom in rows
+    ]
+
+    return DepartementList(departements=departements, total=len(departements))
+
+
+def remember_departements(app: FastAPI, departements: DepartementList) -> None:
+    """Garde en mémoire le corps JSON de la liste, valable CACHE_TTL_MEDIUM secondes."""
+
+    if departements.total:
+        app.state.departements_body = (
+            departements.model_dump_json().encode(),
+            time.monotonic() + CACHE_TTL_MEDIUM,
+        )
+
+
 @router.get("/", response_model=DepartementList, summary="List departements")
 @limiter.limit("100/minute")
-async def list_departements(request: Request, db: Session = Depends(get_db)) -> DepartementList:
+@http_cache(max_age=CACHE_TTL_LONG, stale_while_revalidate=86400)
+async def list_departements(request: Request, db: AsyncSession = Depends(get_db)) -> DepartementList:
     """
     Récupère la liste de tous les départements français depuis la base de données.
 
     Cette endpoint retourne les informations sur tous les départements administratifs
     de France, avec leurs régions associées si disponibles.
     """
+    # Copie en mémoire du processus (préchargée au démarrage) servie sans
+    # toucher Redis ni PostgreSQL ; relue en base à expiration, de sorte
+    # qu'une synchronisation est visible au plus CACHE_TTL_MEDIUM secondes après
+    memory_copy = getattr(request.app.state, "departements_body", None)
+    if memory_copy is not None and memory_copy[1] > time.monotonic():
+        return Response(content=memory_copy[0], media_type="application/json")
+
     try:
-        db_departements = db.query(DBDepartement).order_by(DBDepartement.nom).all()
-
-        departements = []
-        for db_dept in db_departements:
-            departements.append(Departement(
-                id=db_dept.code,
-                name=db_dept.nom,
-                code=db_dept.code,
-                region_id=db_dept.region_code,
-                region_name=db_dept.region.nom if db_dept.region else None
-            ))
-
-        return DepartementList(departements=departements, total=len(departements))
+        departements = await fetch_departements(db)
     except Exception as e:
+        # Base indisponible : la dernière copie connue plutôt qu'une erreur
+        if memory_copy is not None:
+            return Response(content=memory_copy[0], media_type="application/json")
         raise HTTPException(
             status_code=503,
             detail=f"Failed to fetch departements data: {str(e)}"
         )
+
+    remember_departements(request.app, departements)
+    return departements
@@ -1,19 +1,27 @@
 """Lines endpoints."""
 
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
+import httpx
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import decode_cursor, encode_cursor
+from app.core.cache import CACHE_STALE_TTL, CACHE_TTL_MEDIUM, cached
+from app.core.circuit_breaker import CircuitBreakerError
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
 from app.models.db import Line as DBLine
 from app.models.schemas import (
-    LineList, LineDetail, Line, LineStats, TransportMode
+    LineList, LineDetail, LineStats, LineStatsBatchRequest, TransportMode
 )
 from app.services.navitia_service import get_navitia_service
+from app.services.transport_mode import classify_transport_mode
 
 
 router = APIRouter(
@@ -22,57 +30,82 @@ router = APIRouter(
     dependencies=[Depends(require_keycloak_token)],
 )
 
+# Effet Navitia -> (train supprimé, train retardé, minutes de retard estimées)
+_SEVERITY_IMPACT = {
+    "no_service": (1, 0, 0),
+    "blocked": (1, 0, 0),
+    "significant_delays": (0, 1, 30),
+    "delays": (0, 1, 15),
+    "reduced_service": (0, 1, 15),
+}
+
 
 @router.get("/", response_model=LineList, summary="List lines")
 @limiter.limit("100/minute")
+@cached("lines:v1", ttl=CACHE_TTL_MEDIUM, stale_ttl=CACHE_STALE_TTL)
 async def list_lines(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(100, ge=1, le=500, description="Nombre maximum de lignes"),
+    cursor: Optional[str] = Query(None, description="Curseur opaque renvoyé par la page précédente (next_cursor)"),
     transport_mode: Optional[TransportMode] = Query(None, description="Filtrer par mode de transport")
-) -> LineList:
+) -> ORJSONResponse:
     """
     Récupère la liste des lignes ferroviaires SNCF depuis la base de données.
 
-    Permet de lister toutes les lignes du réseau avec filtrage optionnel
-    par mode de transport (TGV, TER, Intercités, etc.).
+    Permet de lister toutes les lignes du réseau avec pagination par curseur
+    et filtrage optionnel par mode de transport (TGV, TER, Intercités, etc.).
     """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 2)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        query = db.query(DBLine).filter(DBLine.is_active == True)
+        # Seules les colonnes exposées par la liste sont lues, en simples tuples
+        query = (
+            select(
+                DBLine.line_code, DBLine.name, DBLine.network, DBLine.operator,
+                DBLine.color, DBLine.transport_mode
+            )
+            .where(DBLine.is_active == True)
+        )
+
+        # Filtre sur transport_mode (calculé à la synchronisation), servi par
+        # l'index partiel idx_lines_active_mode_name_code
+        if transport_mode:
+            query = query.where(DBLine.transport_mode == transport_mode.value)
         
-        total = query.count()
-        db_lines = query.order_by(DBLine.name).limit(limit).all()
-
-        lines = []
-        for db_line in db_lines:
-            # Déterminer le mode de transport depuis le nom et le réseau
-            mode = TransportMode.TRAIN
-            network = (db_line.network or "").upper()
-            line_name = db_line.name.upper()
-            
-            if "TGV" in network or "TGV" in line_name:
-                mode = TransportMode.TGV
-            elif "TER" in network or "TER" in line_name:
-                mode = TransportMode.TER
-            elif "INTERCITES" in network or "INTERCITÉS" in line_name:
-                mode = TransportMode.INTERCITES
-            elif "TRANSILIEN" in network:
-                mode = TransportMode.TRANSILIEN
-
-            # Filtrer par mode si demandé
-            if transport_mode and mode != transport_mode:
-                continue
-
-            lines.append(Line(
-                id=db_line.line_code,
-                name=db_line.name,
-                code=db_line.line_code,
-                transport_mode=mode,
-                operator=db_line.network or "SNCF",
-                color=db_line.color
-            ))
-
-        return LineList(lines=lines, total=len(lines))
+        # Pagination par clé (name, line_code) ; une ligne de plus indique une page suivante
+        if after is not None:
+            query = query.where(tuple_(DBLine.name, DBLine.line_code) > tuple_(*after))
+        result = await db.execute(query.order_by(DBLine.name, DBLine.line_code).limit(limit + 1))
+        db_lines = result.all()
+
+        next_cursor = None
+        if len(db_lines) > limit:
+            db_lines = db_lines[:limit]
+            next_cursor = encode_cursor(db_lines[-1].name, db_lines[-1].line_code)
+
+        lines = [
+            {
+                "id": db_line.line_code,
+                "name": db_line.name,
+                "code": db_line.line_code,
+                # Mode précalculé ; classification à la volée pour les lignes non encore renseignées
+                "transport_mode": (
+                    db_line.transport_mode
+                    or classify_transport_mode(db_line.network, db_line.name).value
+                ),
+                "operator": db_line.operator,
+                "color": db_line.color,
+            }
+            for db_line in db_lines
+        ]
+
+        return ORJSONResponse({"lines": lines, "total": len(lines), "next_cursor": next_cursor})
     except Exception as e:
         raise HTTPException(
             status_code=503,
@@ -82,7 +115,7 @@ async def list_lines(
 
 @router.get("/{line_id}", response_model=LineDetail, summary="Get line details")
 @limiter.limit("100/minute")
-async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)) -> LineDetail:
+async def get_line(line_id: str, request: Request, db: AsyncSession = Depends(get_db)) -> LineDetail:
     """
     Récupère les détails d'une ligne ferroviaire spécifique.
 
@@ -91,24 +124,13 @@ async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)
     """
     try:
         # Chercher la ligne dans la DB
-        db_line = db.query(DBLine).filter(DBLine.line_code == line_id).first()
+        db_line = await db.scalar(select(DBLine).where(DBLine.line_code == line_id))
         
         if not db_line:
             raise HTTPException(status_code=404, detail=f"Line {line_id} not found")
 
         # Déterminer le mode de transport
-        network = (db_line.network or "").upper()
-        line_name = db_line.name.upper()
-        mode = TransportMode.TRAIN
-        
-        if "TGV" in network or "TGV" in line_name:
-            mode = TransportMode.TGV
-        elif "TER" in network or "TER" in line_name:
-            mode = TransportMode.TER
-        elif "INTERCITES" in network or "INTERCITÉS" in line_name:
-            mode = TransportMode.INTERCITES
-        elif "TRANSILIEN" in network:
-            mode = TransportMode.TRANSILIEN
+        mode = db_line.transport_mode or classify_transport_mode(db_line.network, db_line.name)
 
         # Récupérer les routes et stations réelles depuis Navitia
         navitia = get_navitia_service()
@@ -116,13 +138,13 @@ async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)
         
         try:
             # Récupérer les routes de la ligne
-            routes_data = navitia.get_line_routes(line_id)
+            routes_data = await navitia.get_line_routes(line_id)
             if routes_data:
                 # Prendre la première route pour avoir les stations
                 route = routes_data[0] if isinstance(routes_data, list) else routes_data
                 stop_points = route.get("stop_points", [])
                 stations = [sp.get("name", "") for sp in stop_points if sp.get("name")]
-        except:
+        except (httpx.HTTPError, CircuitBreakerError, ValueError):
             # Si l'API ne répond pas, retourner une liste vide
             pass
 
@@ -131,7 +153,7 @@ async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)
             name=db_line.name,
             code=db_line.line_code,
             transport_mode=mode,
-            operator=db_line.network or "SNCF",
+            operator=db_line.operator,
             color=db_line.color,
             stations=stations,
             frequency="Variable selon horaires",
@@ -147,6 +169,55 @@ async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)
         )
 
 
+def _build_line_stats(
+    line_id: str,
+    line_name: str,
+    disruptions: List[Dict[str, Any]],
+    period_start: datetime,
+    period_end: datetime,
+) -> LineStats:
+    """Estime les indicateurs de performance d'une ligne à partir de ses perturbations."""
+    # Une seule lecture de l'effet par disruption, puis calcul par effet distinct
+    effects = Counter(
+        disruption.get("severity", {}).get("effect", "").lower() for disruption in disruptions
+    )
+
+    cancelled_trains = 0
+    delayed_trains = 0
+    total_delay_mins = 0
+    for effect, count in effects.items():
+        cancelled, delayed, delay_mins = _SEVERITY_IMPACT.get(effect, (0, 0, 0))
+        cancelled_trains += cancelled * count
+        delayed_trains += delayed * count
+        total_delay_mins += delay_mins * count
+    total_trains = cancelled_trains + delayed_trains
+
+    # Si aucune disruption, estimer des valeurs par défaut optimistes
+    if total_trains == 0:
+        total_trains = 100
+        delayed_trains = 5
+        cancelled_trains = 1
+        total_delay_mins = 75
+
+    on_time_trains = max(0, total_trains - delayed_trains - cancelled_trains)
+    punctuality_rate = round(on_time_trains / total_trains * 100, 2) if total_trains > 0 else 100.0
+    avg_delay = round(total_delay_mins / delayed_trains, 2) if delayed_trains > 0 else 0.0
+
+    return LineStats(
+        line_id=line_id,
+        line_name=line_name,
+        period_start=period_start,
+        period_end=period_end,
+        total_trains=total_trains,
+        on_time_trains=on_time_trains,
+        delayed_trains=delayed_trains,
+        cancelled_trains=cancelled_trains,
+        punctuality_rate=punctuality_rate,
+        average_delay_minutes=round(avg_delay, 2),
+        incidents_count=len(disruptions)
+    )
+
+
 @router.get(
     "/{line_id}/stats",
     response_model=LineStats,
@@ -156,7 +227,7 @@ async def get_line(line_id: str, request: Request, db: Session = Depends(get_db)
 async def get_line_stats(
     line_id: str,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     days: int = Query(30, ge=1, le=90, description="Nombre de jours d'historique")
 ) -> LineStats:
     """
@@ -170,63 +241,65 @@ async def get_line_stats(
 
         # Récupérer le nom de la ligne depuis la DB
         line_name = "Unknown"
-        db_line = db.query(DBLine).filter(DBLine.line_code == line_id).first()
+        db_line = await db.scalar(select(DBLine).where(DBLine.line_code == line_id))
         if db_line:
             line_name = db_line.name
 
         # Récupérer les disruptions réelles
-        disruptions = navitia.get_line_disruptions(line_id)
-        incidents_count = len(disruptions)
+        disruptions = await navitia.get_line_disruptions(line_id)
 
         period_end = datetime.now()
         period_start = period_end - timedelta(days=days)
 
-        # Analyser les disruptions pour calculer les statistiques
-        total_trains = 0
-        delayed_trains = 0
-        cancelled_trains = 0
-        total_delay_mins = 0
-        
-        for disruption in disruptions:
-            severity = disruption.get("severity", {}).get("effect", "").lower()
-            
-            # Compter les trains impactés
-            if "no_service" in severity or "blocked" in severity:
-                cancelled_trains += 1
-                total_trains += 1
-            elif "significant_delays" in severity:
-                delayed_trains += 1
-                total_trains += 1
-                total_delay_mins += 30  # Estimation pour retard significatif
-            elif "delays" in severity or "reduced_service" in severity:
-                delayed_trains += 1
-                total_trains += 1
-                total_delay_mins += 15  # Estimation pour retard normal
-        
-        # Si aucune disruption, estimer des valeurs par défaut optimistes
-        if total_trains == 0:
-            total_trains = 100
-            delayed_trains = 5
-            cancelled_trains = 1
-            total_delay_mins = 75
-        
-        on_time_trains = max(0, total_trains - delayed_trains - cancelled_trains)
-        punctuality_rate = round(on_time_trains / total_trains * 100, 2) if total_trains > 0 else 100.0
-        avg_delay = round(total_delay_mins / delayed_trains, 2) if delayed_trains > 0 else 0.0
-
-        return LineStats(
-            line_id=line_id,
-            line_name=line_name,
-            period_start=period_start,
-            period_end=period_end,
-            total_trains=total_trains,
-            on_time_trains=on_time_trains,
-            delayed_trains=delayed_trains,
-            cancelled_trains=cancelled_trains,
-            punctuality_rate=punctuality_rate,
-            average_delay_minutes=round(avg_delay, 2),
-            incidents_count=incidents_count
+        return _build_line_stats(line_id, line_name, disruptions, period_start, period_end)
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Failed to fetch line statistics: {str(e)}"
+        )
+
+
+@router.post(
+    "/stats/batch",
+    response_model=List[LineStats],
+    summary="Get performance statistics for several lines",
+)
+@limiter.limit("100/minute")
+async def get_lines_stats_batch(
+    payload: LineStatsBatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    days: int = Query(30, ge=1, le=90, description="Nombre de jours d'historique")
+) -> List[LineStats]:
+    """
+    Analyse les performances de plusieurs lignes en un seul appel.
+
+    Les noms sont lus en une requête SQL et les perturbations de toutes les
+    lignes sont récupérées en parallèle, au lieu d'un appel après l'autre.
+    """
+    try:
+        line_ids = list(dict.fromkeys(payload.line_ids))
+
+        result = await db.execute(
+            select(DBLine.line_code, DBLine.name).where(DBLine.line_code.in_(line_ids))
         )
+        line_names = dict(result.all())
+
+        disruptions_by_line = await get_navitia_service().get_disruptions_for_lines(line_ids)
+
+        period_end = datetime.now()
+        period_start = period_end - timedelta(days=days)
+
+        return [
+            _build_line_stats(
+                line_id,
+                line_names.get(line_id, "Unknown"),
+                disruptions_by_line.get(line_id, []),
+                period_start,
+                period_end,
+            )
+            for line_id in line_ids
+        ]
     except Exception as e:
         raise HTTPException(
             status_code=503,
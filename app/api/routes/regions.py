@@ -1,13 +1,16 @@
 """Regions endpoints."""
 
 from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import CACHE_STALE_TTL, CACHE_TTL_LONG, cached
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
 from app.models.db import Region as DBRegion
-from app.models.schemas import RegionList, Region
+from app.models.schemas import RegionList
 
 
 router = APIRouter(
@@ -19,7 +22,8 @@ router = APIRouter(
 
 @router.get("/", response_model=RegionList, summary="List available regions")
 @limiter.limit("100/minute")
-async def list_regions(request: Request, db: Session = Depends(get_db)) -> RegionList:
+@cached("regions:v1", ttl=CACHE_TTL_LONG, stale_ttl=CACHE_STALE_TTL)
+async def list_regions(request: Request, db: AsyncSession = Depends(get_db)) -> ORJSONResponse:
     """
     Récupère la liste de toutes les régions françaises depuis la base de données.
 
@@ -27,17 +31,17 @@ async def list_regions(request: Request, db: Session = Depends(get_db)) -> Regio
     de France, utile pour filtrer les données ferroviaires par région.
     """
     try:
-        db_regions = db.query(DBRegion).order_by(DBRegion.nom).all()
+        stmt = select(DBRegion.code, DBRegion.nom).order_by(DBRegion.nom)
+        db_regions = (await db.execute(stmt)).all()
 
-        regions = []
-        for db_region in db_regions:
-            regions.append(Region(
-                id=db_region.code,
-                name=db_region.nom,
-                code=db_region.code
-            ))
+        # Les lignes SQL sont rendues directement en JSON (orjson), sans
+        # modèles Pydantic intermédiaires ni seconde sérialisation par FastAPI
+        regions = [
+            {"id": db_region.code, "name": db_region.nom, "code": db_region.code}
+            for db_region in db_regions
+        ]
 
-        return RegionList(regions=regions, total=len(regions))
+        return ORJSONResponse({"regions": regions, "total": len(regions)})
     except Exception as e:
         raise HTTPException(
             status_code=503,
@@ -4,17 +4,21 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import decode_cursor, encode_cursor
+from app.core.cache import CACHE_STALE_TTL, CACHE_TTL_SHORT, cached
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
 from app.models.db import Station as DBStation
 from app.models.schemas import (
-    StationList, StationDetail, Station, StationCoordinates,
-    StationDelayStats, DelayInfo
+    StationList, StationDetail,
+    StationDelayStats
 )
-from app.services.navitia_service import get_navitia_service
+from app.services.navitia_service import get_navitia_service, parse_navitia_datetime
 
 
 router = APIRouter(
@@ -23,51 +27,109 @@ router = APIRouter(
     dependencies=[Depends(require_keycloak_token)],
 )
 
+# Estimation du nombre de lignes tenue par le planificateur PostgreSQL
+# (-1 tant que la table n'a jamais été analysée)
+_STATIONS_ESTIMATE_SQL = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = 'stations'::regclass"
+)
+
+
+async def _estimate_station_count(db: AsyncSession) -> Optional[int]:
+    """Nombre approximatif de gares en O(1), ou None si aucune statistique n'existe."""
+    estimate = await db.scalar(_STATIONS_ESTIMATE_SQL)
+    return estimate if estimate is not None and estimate >= 0 else None
+
 
 @router.get("/", response_model=StationList, summary="List stations")
 @limiter.limit("100/minute")
+@cached("stations:v1", ttl=CACHE_TTL_SHORT, stale_ttl=CACHE_STALE_TTL)
 async def list_stations(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(100, ge=1, le=500, description="Nombre maximum de gares à retourner"),
-    offset: int = Query(0, ge=0, description="Offset pour la pagination"),
-    search: Optional[str] = Query(None, description="Recherche par nom de gare")
-) -> StationList:
+    cursor: Optional[str] = Query(None, description="Curseur opaque renvoyé par la page précédente (next_cursor)"),
+    search: Optional[str] = Query(None, description="Recherche par nom de gare"),
+    departement: Optional[str] = Query(None, description="Filtrer par département")
+) -> ORJSONResponse:
     """
     Récupère la liste des gares SNCF depuis la base de données.
 
     Permet de lister toutes les gares du réseau ferroviaire français avec pagination
-    et recherche par nom.
+    par curseur, recherche par nom et filtre par département.
     """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 2)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        query = db.query(DBStation)
+        # Seules les colonnes exposées sont lues : couvertes par idx_stations_dept_name
+        query = select(
+            DBStation.uic_code,
+            DBStation.name,
+            DBStation.departement_code,
+            DBStation.commune,
+            DBStation.latitude,
+            DBStation.longitude,
+            DBStation.is_active,
+        )
         
+        if departement:
+            query = query.where(DBStation.departement_code == departement)
         if search:
-            query = query.filter(DBStation.name.ilike(f"%{search}%"))
+            query = query.where(DBStation.name.ilike(f"%{search}%"))
         
-        total = query.count()
-        db_stations = query.order_by(DBStation.name).offset(offset).limit(limit).all()
-
-        stations = []
-        for db_station in db_stations:
-            coords = None
-            if db_station.latitude and db_station.longitude:
-                coords = StationCoordinates(
-                    latitude=db_station.latitude,
-                    longitude=db_station.longitude
-                )
-
-            stations.append(Station(
-                id=db_station.uic_code,
-                name=db_station.name,
-                uic_code=db_station.uic_code,
-                departement=db_station.departement_code,
-                commune=db_station.commune,
-                coordinates=coords,
-                is_active=db_station.is_active
-            ))
-
-        return StationList(stations=stations, total=total)
+        # Sans filtre, le total est l'estimation du planificateur : un comptage
+        # exact lirait toute la table à chaque page
+        total = None
+        if not departement and not search:
+            total = await _estimate_station_count(db)
+        windowed_total = total is None and after is None
+
+        # Pagination par clé (name, uic_code) : la page N coûte autant que la page 1 ;
+        # une ligne de plus indique qu'une page suivante existe
+        if windowed_total:
+            # Première page : le total est calculé par une fonction de fenêtre
+            # dans la même requête (un seul aller-retour)
+            query = query.add_columns(func.count().over().label("total"))
+        elif total is None:
+            # Pages suivantes : le total porte sur toutes les gares filtrées,
+            # pas seulement celles situées après le curseur
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        if after is not None:
+            query = query.where(tuple_(DBStation.name, DBStation.uic_code) > tuple_(*after))
+        result = await db.execute(query.order_by(DBStation.name, DBStation.uic_code).limit(limit + 1))
+        db_stations = result.all()
+
+        if windowed_total:
+            total = db_stations[0].total if db_stations else 0
+
+        next_cursor = None
+        if len(db_stations) > limit:
+            db_stations = db_stations[:limit]
+            next_cursor = encode_cursor(db_stations[-1].name, db_stations[-1].uic_code)
+
+        # Les lignes SQL sont rendues directement en JSON (orjson), sans
+        # modèles Pydantic intermédiaires ni seconde sérialisation par FastAPI
+        stations = [
+            {
+                "id": db_station.uic_code,
+                "name": db_station.name,
+                "uic_code": db_station.uic_code,
+                "departement": db_station.departement_code,
+                "commune": db_station.commune,
+                "coordinates": (
+                    {"latitude": db_station.latitude, "longitude": db_station.longitude}
+                    if db_station.latitude and db_station.longitude else None
+                ),
+                "is_active": db_station.is_active,
+            }
+            for db_station in db_stations
+        ]
+
+        return ORJSONResponse({"stations": stations, "total": total, "next_cursor": next_cursor})
     except Exception as e:
         raise HTTPException(
             status_code=503,
@@ -77,7 +139,7 @@ async def list_stations(
 
 @router.get("/{station_id}", response_model=StationDetail, summary="Get station details")
 @limiter.limit("100/minute")
-async def get_station(station_id: str, request: Request, db: Session = Depends(get_db)) -> StationDetail:
+async def get_station(station_id: str, request: Request, db: AsyncSession = Depends(get_db)) -> ORJSONResponse:
     """
     Récupère les détails d'une gare spécifique par son ID (code UIC).
 
@@ -85,17 +147,14 @@ async def get_station(station_id: str, request: Request, db: Session = Depends(g
     son accessibilité et les services disponibles.
     """
     try:
-        db_station = db.query(DBStation).filter(DBStation.uic_code == station_id).first()
+        db_station = await db.scalar(select(DBStation).where(DBStation.uic_code == station_id))
         
         if not db_station:
             raise HTTPException(status_code=404, detail=f"Station {station_id} not found")
         
         coords = None
         if db_station.latitude and db_station.longitude:
-            coords = StationCoordinates(
-                latitude=db_station.latitude,
-                longitude=db_station.longitude
-            )
+            coords = {"latitude": db_station.latitude, "longitude": db_station.longitude}
 
         services = []
         if db_station.has_passengers:
@@ -103,18 +162,18 @@ async def get_station(station_id: str, request: Request, db: Session = Depends(g
         if db_station.has_freight:
             services.append("Fret")
 
-        return StationDetail(
-            id=db_station.uic_code,
-            name=db_station.name,
-            uic_code=db_station.uic_code,
-            departement=db_station.departement_code,
-            commune=db_station.commune,
-            coordinates=coords,
-            is_active=db_station.is_active,
-            address=db_station.commune,  # Utiliser commune comme adresse
-            accessibility=True,  # Info non disponible
-            services=services
-        )
+        return ORJSONResponse({
+            "id": db_station.uic_code,
+            "name": db_station.name,
+            "uic_code": db_station.uic_code,
+            "departement": db_station.departement_code,
+            "commune": db_station.commune,
+            "coordinates": coords,
+            "is_active": db_station.is_active,
+            "address": db_station.commune,  # Utiliser commune comme adresse
+            "accessibility": True,  # Info non disponible
+            "services": services,
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -133,9 +192,9 @@ async def get_station(station_id: str, request: Request, db: Session = Depends(g
 async def get_station_delays(
     station_id: str,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     days: int = Query(7, ge=1, le=30, description="Nombre de jours d'historique")
-) -> StationDelayStats:
+) -> ORJSONResponse:
     """
     Analyse les retards pour une gare spécifique sur une période donnée.
 
@@ -144,7 +203,7 @@ async def get_station_delays(
     """
     try:
         # Récupérer les infos de la gare depuis la DB
-        db_station = db.query(DBStation).filter(DBStation.uic_code == station_id).first()
+        db_station = await db.scalar(select(DBStation).where(DBStation.uic_code == station_id))
         
         if not db_station:
             raise HTTPException(status_code=404, detail=f"Station {station_id} not found")
@@ -154,56 +213,48 @@ async def get_station_delays(
         period_end = datetime.now()
         period_start = period_end - timedelta(days=days)
 
-        # Récupérer les perturbations depuis Navitia pour cette gare
-        disruptions = navitia.get_disruptions()
+        # Perturbations touchant cette gare, via l'index par nom d'arrêt du service
+        station_disruptions = await navitia.get_disruptions_for_stop(db_station.name)
         
-        # Filtrer les disruptions qui affectent cette station
-        station_disruptions = []
         recent_delays = []
+        total_delay_mins = 0
+        max_delay = 0
         
-        for disruption in disruptions:
-            for impacted in disruption.get("impacted_objects", []):
-                pt_object = impacted.get("pt_object", {})
-                obj_type = pt_object.get("embedded_type", "")
-                
-                if obj_type in ["stop_area", "stop_point"]:
-                    station_obj = pt_object.get(obj_type, {})
-                    station_name = station_obj.get("name", "")
-                    
-                    # Vérifier si la station correspond
-                    if station_name and db_station.name.lower() in station_name.lower():
-                        station_disruptions.append(disruption)
-                        
-                        # Extraire les informations de retard
-                        application_periods = disruption.get("application_periods", [])
-                        if application_periods:
-                            first_period = application_periods[0]
-                            begin = first_period.get("begin")
-                            
-                            if begin:
-                                try:
-                                    delay_time = datetime.fromisoformat(begin.replace("Z", "+00:00"))
-                                    
-                                    # Estimer le retard depuis la sévérité
-                                    severity = disruption.get("severity", {}).get("effect", "")
-                                    delay_mins = 0
-                                    if "significant_delays" in severity.lower():
-                                        delay_mins = 30
-                                    elif "delays" in severity.lower():
-                                        delay_mins = 15
-                                    
-                                    if delay_mins > 0 and len(recent_delays) < 5:
-                                        recent_delays.append(DelayInfo(
-                                            train_id=disruption.get("id", "")[:20],
-                                            train_number=disruption.get("id", "")[:10],
-                                            scheduled_time=delay_time,
-                                            actual_time=delay_time + timedelta(minutes=delay_mins),
-                                            delay_minutes=delay_mins,
-                                            status="delayed"
-                                        ))
-                                except:
-                                    pass
-                        break
+        for disruption in station_disruptions:
+            # Le total vient de len(station_disruptions) : inutile de parcourir
+            # la suite une fois les 5 retards récents collectés
+            if len(recent_delays) >= 5:
+                break
+
+            # Extraire les informations de retard
+            application_periods = disruption.get("application_periods", [])
+            if not application_periods:
+                continue
+
+            # Date absente ou invalide : None, sans lever d'exception
+            delay_time = parse_navitia_datetime(application_periods[0].get("begin"))
+            if delay_time is None:
+                continue
+
+            # Estimer le retard depuis la sévérité
+            severity = disruption.get("severity", {}).get("effect", "").lower()
+            delay_mins = 0
+            if "significant_delays" in severity:
+                delay_mins = 30
+            elif "delays" in severity:
+                delay_mins = 15
+
+            if delay_mins > 0:
+                total_delay_mins += delay_mins
+                max_delay = max(max_delay, delay_mins)
+                recent_delays.append({
+                    "train_id": disruption.get("id", "")[:20],
+                    "train_number": disruption.get("id", "")[:10],
+                    "scheduled_time": delay_time,
+                    "actual_time": delay_time + timedelta(minutes=delay_mins),
+                    "delay_minutes": delay_mins,
+                    "status": "delayed",
+                })
 
         # Calculer les statistiques à partir des disruptions réelles
         total_disruptions = len(station_disruptions)
@@ -212,28 +263,25 @@ async def get_station_delays(
         # Estimer le nombre total de trains (basé sur les disruptions)
         total_trains = max(delayed_trains * 5, 50)  # Estimation: 1 disruption pour ~5 trains
         
-        # Calculer les moyennes
-        if recent_delays:
-            avg_delay = sum(d.delay_minutes for d in recent_delays) / len(recent_delays)
-            max_delay = max(d.delay_minutes for d in recent_delays)
-        else:
-            avg_delay = 0
-            max_delay = 0
+        # Moyenne à partir des cumuls tenus pendant le parcours
+        avg_delay = total_delay_mins / len(recent_delays) if recent_delays else 0.0
         
         on_time_rate = round((total_trains - delayed_trains) / total_trains * 100, 2) if total_trains > 0 else 100.0
 
-        return StationDelayStats(
-            station_id=station_id,
-            station_name=db_station.name,
-            period_start=period_start,
-            period_end=period_end,
-            total_trains=total_trains,
-            delayed_trains=delayed_trains,
-            average_delay_minutes=round(avg_delay, 2),
-            max_delay_minutes=max_delay,
-            on_time_rate=on_time_rate,
-            recent_delays=recent_delays
-        )
+        # Valeurs calculées ici : rendues directement en JSON (orjson), sans
+        # modèles Pydantic ni seconde sérialisation par FastAPI
+        return ORJSONResponse({
+            "station_id": station_id,
+            "station_name": db_station.name,
+            "period_start": period_start,
+            "period_end": period_end,
+            "total_trains": total_trains,
+            "delayed_trains": delayed_trains,
+            "average_delay_minutes": round(avg_delay, 2),
+            "max_delay_minutes": max_delay,
+            "on_time_rate": on_time_rate,
+            "recent_delays": recent_delays,
+        })
     except HTTPException:
         raise
     except Exception as e:
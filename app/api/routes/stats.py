@@ -1,15 +1,17 @@
 """System-wide statistics endpoints."""
 
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
-from app.models.db import Station, Line, Train
+from app.models.db import network_overview
 from app.services.navitia_service import get_navitia_service
 
 
@@ -31,9 +33,15 @@ router = APIRouter(
 )
 
 
-@router.get("/overview", response_model=NetworkOverview, summary="Get global statistics overview")
+# Schéma documenté via `responses` : pas de revalidation de la réponse par FastAPI
+@router.get(
+    "/overview",
+    response_model=None,
+    responses={200: {"model": NetworkOverview}},
+    summary="Get global statistics overview",
+)
 @limiter.limit("100/minute")
-async def get_stats_overview(request: Request, db: Session = Depends(get_db)) -> NetworkOverview:
+async def get_stats_overview(request: Request, db: AsyncSession = Depends(get_db)) -> ORJSONResponse:
     """
     Récupère une vue d'ensemble des statistiques du réseau ferroviaire SNCF.
 
@@ -44,49 +52,36 @@ async def get_stats_overview(request: Request, db: Session = Depends(get_db)) ->
     try:
         navitia = get_navitia_service()
 
-        # Récupérer les données depuis la base de données
-        total_stations = db.query(Station).filter(Station.is_active == True).count()
-        total_lines = db.query(Line).filter(Line.is_active == True).count()
-        
-        # Récupérer les trains actifs depuis la DB
-        active_trains = db.query(Train).filter(Train.is_active == True).count()
+        # Compteurs et retard moyen lus dans la vue matérialisée mv_network_overview,
+        # rafraîchie en tâche de fond et après chaque synchronisation ; updated_at
+        # renvoie l'heure de ce rafraîchissement, pas celle de la requête
+        counts = (await db.execute(select(network_overview))).one()
+        total_stations = counts.total_stations
+        total_lines = counts.total_lines
+        active_trains = counts.active_trains
+        delayed_trains = counts.delayed_trains
+        avg_delay = float(counts.avg_delay)
 
         # Récupérer les alertes actives depuis Navitia (live)
-        disruptions = navitia.get_disruptions()
+        disruptions = await navitia.get_disruptions()
         active_alerts = len(disruptions)
 
         # Calculer la ponctualité moyenne depuis les trains en DB
-        delayed_trains = db.query(Train).filter(
-            Train.is_active == True,
-            Train.delay_minutes > 0
-        ).count()
-        
         if active_trains > 0:
             on_time_trains = active_trains - delayed_trains
             global_punctuality = round((on_time_trains / active_trains) * 100, 2)
         else:
             global_punctuality = 100.0
-        
-        # Calculer le retard moyen
-        trains_with_delays = db.query(Train).filter(
-            Train.is_active == True,
-            Train.delay_minutes > 0
-        ).all()
-        
-        if trains_with_delays:
-            avg_delay = sum(t.delay_minutes for t in trains_with_delays) / len(trains_with_delays)
-        else:
-            avg_delay = 0.0
 
-        return NetworkOverview(
-            total_stations=total_stations,
-            total_lines=total_lines,
-            active_trains=active_trains if active_trains > 0 else 0,
-            active_alerts=active_alerts,
-            global_punctuality_rate=global_punctuality,
-            average_delay_minutes=round(avg_delay, 2),
-            updated_at=datetime.now()
-        )
+        return ORJSONResponse({
+            "total_stations": total_stations,
+            "total_lines": total_lines,
+            "active_trains": active_trains if active_trains > 0 else 0,
+            "active_alerts": active_alerts,
+            "global_punctuality_rate": global_punctuality,
+            "average_delay_minutes": round(avg_delay, 2),
+            "updated_at": counts.refreshed_at,
+        })
     except Exception as e:
         raise HTTPException(
             status_code=503,
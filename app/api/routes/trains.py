@@ -4,16 +4,19 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import CACHE_TTL_REALTIME, cached
 from app.core.rate_limit import limiter
 from app.core.security import require_keycloak_token
 from app.core.database import get_db
 from app.models.db import Train as DBTrain, Station as DBStation
 from app.models.schemas import (
-    TrainList, TrainDetail, Train, TrainStop, TransportMode
+    TrainList, TrainDetail, TrainStop, TransportMode
 )
-from app.services.navitia_service import get_navitia_service
+from app.services.navitia_service import get_navitia_service, parse_navitia_datetime
 
 
 router = APIRouter(
@@ -22,27 +25,44 @@ router = APIRouter(
     dependencies=[Depends(require_keycloak_token)],
 )
 
+# Mode de transport déduit des trois premiers caractères du numéro de train
+_PREFIX_MODES = {
+    "TGV": TransportMode.TGV,
+    "TER": TransportMode.TER,
+}
+
+
+def _train_mode(train_number: Optional[str]) -> TransportMode:
+    """Déduit le mode de transport d'un train à partir de son numéro."""
+    if not train_number:
+        return TransportMode.TRAIN
+    return _PREFIX_MODES.get(train_number[:3], TransportMode.TRAIN)
+
 
 @router.get("/", response_model=TrainList, summary="List trains")
 @limiter.limit("100/minute")
+@cached("trains:v1", ttl=CACHE_TTL_REALTIME)
 async def list_trains(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(50, ge=1, le=200, description="Nombre maximum de trains"),
     station_id: Optional[str] = Query(None, description="Filtrer par gare de départ"),
     status: Optional[str] = Query(None, description="Filtrer par statut")
-) -> TrainList:
+) -> ORJSONResponse:
     """
     Récupère la liste des trains en circulation ou à venir depuis la base de données.
 
     Permet de lister les trains avec filtrage optionnel par gare de départ
     et statut (scheduled, in_progress, delayed, cancelled).
+
+    Les trains sont rendus directement en JSON (orjson), sans modèles Pydantic
+    intermédiaires ni seconde sérialisation par FastAPI.
     """
     try:
         # Si une gare est spécifiée, récupérer les départs en temps réel via Navitia
         if station_id:
             navitia = get_navitia_service()
-            departures = navitia.get_departures(station_id, count=limit)
+            departures = await navitia.get_departures(station_id, count=limit)
             
             trains = []
             for dep in departures:
@@ -50,66 +70,67 @@ async def list_trains(
                 route = dep.get("route", {})
                 line = route.get("line", {})
                 
-                # Déterminer le statut
+                # Déterminer le statut (horaires Navitia lus une seule fois chacun)
                 stop_date_time = dep.get("stop_date_time", {})
-                departure_time_str = stop_date_time.get("departure_date_time")
-                base_departure_str = stop_date_time.get("base_departure_date_time")
+                actual = parse_navitia_datetime(stop_date_time.get("departure_date_time"))
+                scheduled = parse_navitia_datetime(stop_date_time.get("base_departure_date_time"))
                 
                 train_status = "scheduled"
-                if departure_time_str and base_departure_str:
-                    try:
-                        actual = datetime.strptime(departure_time_str, "%Y%m%dT%H%M%S")
-                        scheduled = datetime.strptime(base_departure_str, "%Y%m%dT%H%M%S")
-                        if actual > scheduled:
-                            train_status = "delayed"
-                    except:
-                        pass
+                if actual and scheduled and actual > scheduled:
+                    train_status = "delayed"
                 
-                trains.append(Train(
-                    id=route.get("id", ""),
-                    number=route.get("name", ""),
-                    line_id=line.get("id", ""),
-                    transport_mode=TransportMode.TRAIN,
-                    departure_station=stop_point.get("name", station_id),
-                    arrival_station=route.get("direction", {}).get("name", ""),
-                    departure_time=datetime.strptime(departure_time_str, "%Y%m%dT%H%M%S") if departure_time_str else datetime.now(),
-                    arrival_time=None,
-                    status=train_status
-                ))
+                trains.append({
+                    "id": route.get("id", ""),
+                    "number": route.get("name", ""),
+                    "line_id": line.get("id", ""),
+                    "transport_mode": TransportMode.TRAIN.value,
+                    "departure_station": stop_point.get("name", station_id),
+                    "arrival_station": route.get("direction", {}).get("name", ""),
+                    "departure_time": actual or datetime.now(),
+                    "arrival_time": None,
+                    "status": train_status,
+                })
             
-            return TrainList(trains=trains, total=len(trains))
+            return ORJSONResponse({"trains": trains, "total": len(trains)})
         
         # Sinon, récupérer depuis la DB
-        query = db.query(DBTrain).filter(DBTrain.is_active == True)
-        
+        filters = [DBTrain.is_active == True]
         if status:
-            query = query.filter(DBTrain.status == status)
-        
-        total = query.count()
-        db_trains = query.order_by(DBTrain.departure_time.desc()).limit(limit).all()
+            filters.append(DBTrain.status == status)
+
+
+        # Seules les colonnes exposées sont lues (lignes, pas d'objets ORM) ;
+        # le total est calculé par une fonction de fenêtre dans la même requête
+        query = select(
+            DBTrain.id,
+            DBTrain.train_number,
+            DBTrain.line_code,
+            DBTrain.origin,
+            DBTrain.destination,
+            DBTrain.departure_time,
+            DBTrain.arrival_time,
+            DBTrain.status,
+            func.count().over().label("total"),
+        ).where(*filters)
+        result = await db.execute(query.order_by(DBTrain.departure_time.desc()).limit(limit))
+        db_trains = result.all()
+        total = db_trains[0].total if db_trains else 0
         
         trains = []
         for db_train in db_trains:
-            # Déterminer le mode de transport (simplification)
-            mode = TransportMode.TRAIN
-            if db_train.train_number and db_train.train_number.startswith("TGV"):
-                mode = TransportMode.TGV
-            elif db_train.train_number and db_train.train_number.startswith("TER"):
-                mode = TransportMode.TER
-            
-            trains.append(Train(
-                id=str(db_train.id),
-                number=db_train.train_number,
-                line_id=db_train.line_code or "",
-                transport_mode=mode,
-                departure_station=db_train.origin or "",
-                arrival_station=db_train.destination or "",
-                departure_time=db_train.departure_time,
-                arrival_time=db_train.arrival_time,
-                status=db_train.status or "scheduled"
-            ))
-
-        return TrainList(trains=trains, total=total)
+            trains.append({
+                "id": str(db_train.id),
+                "number": db_train.train_number,
+                "line_id": db_train.line_code or "",
+                "transport_mode": _train_mode(db_train.train_number).value,
+                "departure_station": db_train.origin or "",
+                "arrival_station": db_train.destination or "",
+                "departure_time": db_train.departure_time,
+                "arrival_time": db_train.arrival_time,
+                "status": db_train.status or "scheduled",
+            })
+
+        return ORJSONResponse({"trains": trains, "total": total})
     except Exception as e:
         raise HTTPException(
             status_code=503,
@@ -119,7 +140,7 @@ async def list_trains(
 
 @router.get("/{train_id}", response_model=TrainDetail, summary="Get train details")
 @limiter.limit("100/minute")
-async def get_train(train_id: str, request: Request, db: Session = Depends(get_db)) -> TrainDetail:
+async def get_train(train_id: str, request: Request, db: AsyncSession = Depends(get_db)) -> ORJSONResponse:
     """
     Récupère les détails complets d'un train spécifique.
 
@@ -131,38 +152,33 @@ async def get_train(train_id: str, request: Request, db: Session = Depends(get_d
         db_train = None
         try:
             train_id_int = int(train_id)
-            db_train = db.query(DBTrain).filter(DBTrain.id == train_id_int).first()
+            db_train = await db.scalar(select(DBTrain).where(DBTrain.id == train_id_int))
         except ValueError:
             # L'ID n'est pas un nombre, chercher par numéro de train
-            db_train = db.query(DBTrain).filter(DBTrain.train_number == train_id).first()
+            db_train = await db.scalar(select(DBTrain).where(DBTrain.train_number == train_id))
         
         if db_train:
-            # Déterminer le mode de transport
-            mode = TransportMode.TRAIN
-            if db_train.train_number and db_train.train_number.startswith("TGV"):
-                mode = TransportMode.TGV
-            elif db_train.train_number and db_train.train_number.startswith("TER"):
-                mode = TransportMode.TER
-            
             # Note: Les arrêts détaillés ne sont pas stockés en DB, 
             # ils devraient être récupérés via Navitia en temps réel
             stops = []
             
-            return TrainDetail(
-                id=str(db_train.id),
-                number=db_train.train_number,
-                line_id=db_train.line_code or "",
-                transport_mode=mode,
-                departure_station=db_train.origin or "",
-                arrival_station=db_train.destination or "",
-                departure_time=db_train.departure_time,
-                arrival_time=db_train.arrival_time,
-                status=db_train.status or "scheduled",
-                stops=stops,
-                current_delay_minutes=db_train.delay_minutes,
-                platform="N/A",  # Info non disponible en DB
-                composition="N/A"  # Info non disponible en DB
-            )
+            # Train issu de la DB rendu directement en JSON (orjson), sans
+            # revalidation ni seconde sérialisation par FastAPI
+            return ORJSONResponse({
+                "id": str(db_train.id),
+                "number": db_train.train_number,
+                "line_id": db_train.line_code or "",
+                "transport_mode": _train_mode(db_train.train_number).value,
+                "departure_station": db_train.origin or "",
+                "arrival_station": db_train.destination or "",
+                "departure_time": db_train.departure_time,
+                "arrival_time": db_train.arrival_time,
+                "status": db_train.status or "scheduled",
+                "stops": stops,
+                "current_delay_minutes": db_train.delay_minutes or 0,
+                "platform": "N/A",  # Info non disponible en DB
+                "composition": "N/A",  # Info non disponible en DB
+            })
         
         # Si pas trouvé en DB, retourner une erreur
         raise HTTPException(
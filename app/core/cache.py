@@ -0,0 +1,211 @@
+"""Redis-backed response caching utilities."""
+
+import hashlib
+import logging
+from functools import lru_cache, wraps
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.responses import Response
+
+from app.core.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Cache policies (seconds): "long" for administrative reference data,
+# "medium" for network data refreshed by the sync job, "short" for
+# paginated lists whose content may change between syncs.
+CACHE_TTL_LONG = 3600
+CACHE_TTL_MEDIUM = 300
+CACHE_TTL_SHORT = 10
+# Real-time data (departures) is only shared between near-simultaneous calls
+CACHE_TTL_REALTIME = 5
+# How long a last known good body is kept to answer while the source fails
+CACHE_STALE_TTL = 86400
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> Optional[Redis]:
+    """Return a cached Redis client, or None when REDIS_URL is not configured."""
+
+    settings = get_settings()
+    if not settings.REDIS_URL:
+        return None
+    return Redis.from_url(settings.REDIS_URL)
+
+
+async def close_redis() -> None:
+    """Close the Redis connection pool if one was opened."""
+
+    client = get_redis()
+    if client is not None:
+        await client.aclose()
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """Return the raw value stored under ``key``, or None on miss or Redis error."""
+
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except RedisError as exc:
+        logger.warning("Lecture du cache Redis impossible (%s): %s", key, exc)
+        return None
+
+
+async def cache_set(key: str, value: bytes, ttl: int) -> None:
+    """Store ``value`` under ``key`` for ``ttl`` seconds, ignoring Redis errors."""
+
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl)
+    except RedisError as exc:
+        logger.warning("Écriture du cache Redis impossible (%s): %s", key, exc)
+
+
+async def cache_set_hash(key: str, mapping: Dict[str, Union[str, int, float]], ttl: int) -> None:
+    """Store a metadata hash under ``key`` for ``ttl`` seconds, ignoring Redis errors."""
+
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.hset(key, mapping=mapping)
+        await client.expire(key, ttl)
+    except RedisError as exc:
+        logger.warning("Écriture du cache Redis impossible (%s): %s", key, exc)
+
+
+async def invalidate_cache(*prefixes: str) -> int:
+    """Delete every cached entry whose key starts with one of ``prefixes``.
+
+    Returns the number of deleted keys; Redis errors are logged and ignored.
+    """
+
+    client = get_redis()
+    if client is None:
+        return 0
+    deleted = 0
+    try:
+        for prefix in prefixes:
+            keys = [key async for key in client.scan_iter(match=f"{prefix}*", count=500)]
+            if keys:
+                deleted += await client.delete(*keys)
+    except RedisError as exc:
+        logger.warning("Invalidation du cache Redis impossible (%s): %s", ", ".join(prefixes), exc)
+    return deleted
+
+
+def _serialize(result: Any) -> bytes:
+    """Return the JSON body an endpoint result will be rendered to."""
+
+    if isinstance(result, Response):
+        return bytes(result.body)
+    if isinstance(result, BaseModel):
+        return result.model_dump_json().encode()
+    return orjson.dumps(jsonable_encoder(result))
+
+
+def cached(
+    key: str, ttl: int, stale_ttl: int = 0
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Cache the JSON body returned by an endpoint in Redis for ``ttl`` seconds.
+
+    The cache key is ``key`` suffixed with the request query string so that
+    paginated or filtered variants of the same endpoint are stored separately.
+    With ``stale_ttl``, a copy is also kept that long under ``<key>:stale`` and
+    served when the endpoint fails with a 5xx ``HTTPException``.
+    Redis failures are logged and the endpoint is executed normally.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if get_redis() is None:
+                return await func(*args, **kwargs)
+
+            request: Optional[Request] = kwargs.get("request")
+            cache_key = key
+            if request is not None and request.url.query:
+                cache_key = f"{key}:{request.url.query}"
+
+            body = await cache_get(cache_key)
+            if body is not None:
+                return Response(content=body, media_type="application/json")
+
+            try:
+                result = await func(*args, **kwargs)
+            except HTTPException as exc:
+                if stale_ttl and exc.status_code >= 500:
+                    stale_body = await cache_get(f"{cache_key}:stale")
+                    if stale_body is not None:
+                        logger.warning("Réponse périmée servie pour %s: %s", cache_key, exc.detail)
+                        return Response(content=stale_body, media_type="application/json")
+                raise
+
+            if not isinstance(result, Response) or result.status_code == 200:
+                body = _serialize(result)
+                await cache_set(cache_key, body, ttl)
+                if stale_ttl:
+                    await cache_set(f"{cache_key}:stale", body, stale_ttl)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def http_cache(
+    max_age: int, stale_while_revalidate: int = 0
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Attach ``Cache-Control`` and a strong ``ETag`` to an endpoint's JSON body.
+
+    The ETag is a hash of the rendered body. A request whose ``If-None-Match``
+    matches it receives an empty 304, so browsers and CDNs can reuse their copy.
+    Headers set by the endpoint on its ``response`` parameter are preserved.
+    """
+
+    cache_control = f"public, max-age={max_age}"
+    if stale_while_revalidate:
+        cache_control += f", stale-while-revalidate={stale_while_revalidate}"
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = await func(*args, **kwargs)
+            if isinstance(result, Response) and result.status_code != 200:
+                return result
+
+            body = _serialize(result)
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            headers = {"Cache-Control": cache_control, "ETag": etag}
+
+            sub_response: Optional[Response] = kwargs.get("response")
+            if isinstance(sub_response, Response):
+                for name, value in sub_response.headers.items():
+                    if name != "content-length":
+                        headers[name] = value
+
+            request: Optional[Request] = kwargs.get("request")
+            if_none_match = request.headers.get("if-none-match") if request is not None else None
+            if if_none_match:
+                tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+                if etag in tags or "*" in tags:
+                    return Response(status_code=304, headers=headers)
+
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        return wrapper
+
+    return decorator
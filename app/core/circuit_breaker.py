@@ -0,0 +1,56 @@
+"""Minimal circuit breaker for upstream HTTP services."""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after ``fail_max`` consecutive failures.
+
+    While open, ``before_call`` fails fast with :class:`CircuitBreakerError`.
+    Once ``reset_timeout`` seconds have elapsed calls are let through again:
+    the next success closes the circuit, the next failure reopens it.
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0) -> None:
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected."""
+        opened_at = self._opened_at
+        return opened_at is not None and time.monotonic() - opened_at < self.reset_timeout
+
+    def before_call(self) -> None:
+        """Raise :class:`CircuitBreakerError` if the circuit is open."""
+        if self.is_open:
+            raise CircuitBreakerError(f"{self.name} circuit is open")
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit once ``fail_max`` is reached."""
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                if self._opened_at is None:
+                    logger.warning("%s circuit opened after %d failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
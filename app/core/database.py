@@ -1,37 +1,121 @@
 """Database utilities for PostgreSQL access."""
 
-from collections.abc import Generator
+import asyncio
+from collections.abc import AsyncGenerator
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from app.core.config import get_settings
 
 
 settings = get_settings()
 
+
+def _async_database_url(database_url: str) -> URL:
+    """Return the DATABASE_URL rewritten for the asyncpg driver.
+
+    asyncpg prepares every statement it runs; the per-connection cache size
+    decides how many of those plans are reused instead of re-parsed.
+    """
+
+    return make_url(database_url).set(drivername="postgresql+asyncpg").update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    )
+
+
 engine = create_engine(
     str(settings.DATABASE_URL),
-    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_PRE_PING,
     future=True,
 )
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
-Base = declarative_base()
+
+
+class Base(DeclarativeBase):
+    """Declarative base shared by every ORM model."""
+
+
+# Async engine used by the API routes: one pool per process, shared by every
+# request, so handlers never pay a connection handshake nor block the event loop.
+async_engine = create_async_engine(
+    _async_database_url(str(settings.DATABASE_URL)),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_PRE_PING,
+    connect_args={"command_timeout": 30},
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Transaction-level advisory lock serialising the upgrade statements of
+# init_db(): every Uvicorn worker runs it at startup, and concurrent
+# CREATE ... IF NOT EXISTS of the same object can fail on a duplicate key
+SCHEMA_UPGRADE_LOCK_KEY = 7300
 
 
 def init_db() -> None:
     """Create database tables if they don't already exist."""
 
-    import app.models.db  # noqa: F401 - ensure models are imported
+    # Importing the module also registers every model on Base
+    from app.models.db import SCHEMA_UPGRADE_DDL, NETWORK_OVERVIEW_DDL
 
+    with engine.begin() as connection:
+        # Required by the trigram index on station names
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # Released at commit; the other workers then find everything in place
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_UPGRADE_LOCK_KEY})
+        # Brings tables created by an earlier release up to the current models
+        for statement in SCHEMA_UPGRADE_DDL:
+            connection.execute(text(statement))
+        for statement in NETWORK_OVERVIEW_DDL:
+            connection.execute(text(statement))
+
+
+# Session-level advisory lock held by the one process refreshing the network
+# overview, so that N Uvicorn workers do not run N refreshes per interval
+NETWORK_OVERVIEW_LOCK_KEY = 7301
+_LOCK_PARAMS = {"key": NETWORK_OVERVIEW_LOCK_KEY}
+
+
+async def refresh_network_overview_while_leader(interval: float) -> None:
+    """Refresh the network overview every ``interval`` seconds while holding its lock.
+
+    Returns at once if another process holds the lock. The lock lives on a
+    dedicated connection and is released when this coroutine exits, cancellation
+    included, or when that connection drops.
+    """
+
+    from app.models.db import REFRESH_NETWORK_OVERVIEW_SQL
+
+    async with async_engine.connect() as connection:
+        locked = await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), _LOCK_PARAMS)
+        # The lock survives the commit; no transaction stays open while idle
+        await connection.commit()
+        if not locked:
+            return
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                # CONCURRENTLY: readers are never blocked
+                await connection.execute(text(REFRESH_NETWORK_OVERVIEW_SQL))
+                await connection.commit()
+        finally:
+            await connection.rollback()
+            await connection.execute(text("SELECT pg_advisory_unlock(:key)"), _LOCK_PARAMS)
+            await connection.commit()
 
 
-def get_db() -> Generator[Session, None, None]:
-    """FastAPI dependency providing a scoped SQLAlchemy session."""
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency providing a pooled asynchronous SQLAlchemy session."""
 
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -4,7 +4,9 @@ from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+
+from app.core.config import get_settings
 
 
 def user_rate_limit_identifier(request: Request) -> str:
@@ -21,10 +23,21 @@ def user_rate_limit_identifier(request: Request) -> str:
     return get_remote_address(request)
 
 
-limiter = Limiter(key_func=user_rate_limit_identifier, default_limits=["100/minute"])
+# Counters live in Redis when configured, so limits hold across Uvicorn workers.
+# The fixed window costs a single INCR per check; while Redis is unreachable
+# each worker falls back to its own in-memory counters.
+_settings = get_settings()
+limiter = Limiter(
+    key_func=user_rate_limit_identifier,
+    default_limits=["100/minute"],
+    storage_uri=_settings.REDIS_URL or "memory://",
+    strategy="fixed-window",
+    key_prefix="ratelimit",
+    in_memory_fallback_enabled=bool(_settings.REDIS_URL),
+)
 
 
-def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSONResponse:  # pragma: no cover - HTTP handler
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> ORJSONResponse:  # pragma: no cover - HTTP handler
     """Return a JSON response when the client exceeds the allowed rate."""
 
-    return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+    return ORJSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
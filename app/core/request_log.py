@@ -0,0 +1,86 @@
+"""Batched, non-blocking persistence of API request logs."""
+
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.database import async_engine
+from app.models.db import RequestLog
+
+
+logger = logging.getLogger(__name__)
+
+# Plain Core INSERT on the table: no ORM unit of work, and the statement is
+# built once so its compiled form is reused by every batch (executemany)
+_LOG_INSERT = insert(RequestLog.__table__)
+
+
+class RequestLogWriter:
+    """Buffer request log rows in memory and insert them in batches.
+
+    ``record`` never touches the database: rows are flushed by a background
+    task every ``flush_interval`` seconds, or as soon as ``batch_size`` rows
+    are waiting, with one multi-row INSERT per batch. Rows beyond
+    ``max_pending`` are dropped rather than slowing requests down.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0, max_pending: int = 10000) -> None:
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, **row: Any) -> None:
+        """Queue one request log row, timestamped now."""
+        if len(self._pending) >= self._max_pending:
+            logger.warning("Request log buffer full, dropping entry for %s", row.get("path"))
+            return
+        row.setdefault("created_at", datetime.now(timezone.utc))
+        self._pending.append(row)
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task once every pending row has been written."""
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while not self._closed:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            self._wakeup.clear()
+            await self._flush()
+        await self._flush()
+
+    async def _flush(self) -> None:
+        while self._pending:
+            batch = self._pending[:self._batch_size]
+            del self._pending[:self._batch_size]
+            try:
+                async with async_engine.begin() as conn:
+                    await conn.execute(_LOG_INSERT, batch)
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Failed to persist %d request logs", len(batch))
+
+
+@lru_cache(maxsize=None)
+def get_request_log_writer() -> RequestLogWriter:
+    """Return the process-wide request log writer."""
+    return RequestLogWriter()
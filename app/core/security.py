@@ -1,74 +1,137 @@
 """Keycloak security utilities for JWT validation."""
 
+import asyncio
+import hashlib
 import logging
+import time
 from functools import lru_cache
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
-from fastapi import HTTPException, Request, Security
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi import HTTPException, Request
 import jwt
-from jwt import InvalidAudienceError, InvalidTokenError, PyJWKClient, PyJWKClientError
+from jwt import InvalidTokenError, PyJWK, PyJWKClient, PyJWKClientError
 
 from app.core.config import get_settings
 
 
+# Seconds a signing key is reused before being looked up in the JWKS again,
+# so that keys removed from Keycloak stop being accepted
+JWKS_KEY_LIFESPAN = 300
+
+# Verified payloads are reused for at most this many seconds, and never past
+# the token's own expiry (minus a small margin)
+TOKEN_CACHE_TTL = 30
+TOKEN_CACHE_MAX_SIZE = 4096
+TOKEN_EXPIRY_MARGIN = 5
+
+# Bearer scheme advertised in the OpenAPI schema (see app.main)
+OPENAPI_SECURITY_SCHEMES = {"HTTPBearer": {"type": "http", "scheme": "bearer"}}
+
+
 class KeycloakTokenVerifier:
     """Validates JWT access tokens issued by Keycloak."""
 
     def __init__(self, jwks_url: str, audience: str, issuer: str) -> None:
-        self._jwks_url = jwks_url
         self._audience = audience
-        self._issuer = issuer
-        self._jwks_client = PyJWKClient(jwks_url, cache_keys=False)
+        # Decode arguments are constant: built once instead of on every verify.
+        # The audience is compared after decoding (see _verify_signature).
+        self._decode_kwargs: Dict[str, Any] = {
+            "algorithms": ["RS256"],
+            "issuer": issuer,
+            "options": {
+                "require": ["exp", "iss", "aud"] if audience else ["exp", "iss"],
+                "verify_aud": False,
+            },
+        }
+        # The JWK set is cached for JWKS_KEY_LIFESPAN and refetched by PyJWT
+        # whenever an unknown ``kid`` shows up (key rotation)
+        self._jwks_client = PyJWKClient(jwks_url, cache_jwk_set=True, lifespan=JWKS_KEY_LIFESPAN)
+        # Parsed signing keys by ``kid`` with their expiry (monotonic time)
+        self._keys_by_kid: Dict[Optional[str], Tuple[PyJWK, float]] = {}
+        # Verified payloads by token digest (raw tokens are not kept in memory)
+        self._payloads: Dict[bytes, Tuple[Dict[str, Any], float]] = {}
+
+    async def _get_signing_key(self, token: str) -> PyJWK:
+        """Return the key matching the token's ``kid``, fetching the JWKS only on a miss.
+
+        PyJWKClient fetches the JWKS with blocking I/O, so a miss runs in a
+        worker thread instead of stalling the event loop.
+        """
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except InvalidTokenError as exc:
+            raise HTTPException(status_code=401, detail="Invalid authorization token") from exc
 
-    def verify(self, token: str) -> Dict[str, Any]:
-        """Validate a JWT token and return its payload."""
+        cached = self._keys_by_kid.get(kid)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
 
         try:
-            signing_key = self._jwks_client.get_signing_key_from_jwt(token)
-        except PyJWKClientError:
-            logging.getLogger(__name__).warning(
-                "Cache JWKS invalide, tentative de rafraîchissement à chaud."
+            signing_key = await asyncio.to_thread(self._jwks_client.get_signing_key, kid)
+        except PyJWKClientError as exc:
+            logging.getLogger(__name__).error(
+                "Impossible de récupérer la clé publique pour le token reçu: %s", exc
             )
-            self._jwks_client = PyJWKClient(self._jwks_url, cache_keys=False)
-            try:
-                signing_key = self._jwks_client.get_signing_key_from_jwt(token)
-            except PyJWKClientError as exc:
-                logging.getLogger(__name__).error(
-                    "Impossible de récupérer la clé publique pour le token reçu: %s", exc
-                )
-                raise HTTPException(status_code=503, detail="Unable to verify authorization token") from exc
-
-        base_options = {"require": ["exp", "iss"]}
-
-        def _decode(verify_audience: bool) -> Dict[str, Any]:
-            options = dict(base_options)
-            options["verify_aud"] = verify_audience
-            decode_kwargs = {
-                "jwt": token,
-                "key": signing_key.key,
-                "algorithms": ["RS256"],
-                "issuer": self._issuer,
-                "options": options,
-            }
-            if verify_audience and self._audience:
-                decode_kwargs["audience"] = self._audience
-            return jwt.decode(**decode_kwargs)  # type: ignore[arg-type]
+            raise HTTPException(status_code=503, detail="Unable to verify authorization token") from exc
+
+        self._keys_by_kid[kid] = (signing_key, time.monotonic() + JWKS_KEY_LIFESPAN)
+        return signing_key
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Validate a JWT token and return its payload.
+
+        A token that was verified recently is served from memory instead of
+        checking its RSA signature again.
+        """
+
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = self._payloads.get(digest)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        payload = await self._verify_signature(token)
+        self._remember(digest, payload)
+        return payload
+
+    def _remember(self, digest: bytes, payload: Dict[str, Any]) -> None:
+        """Cache a verified payload until shortly before the token expires."""
 
+        remaining = payload["exp"] - time.time() - TOKEN_EXPIRY_MARGIN
+        if remaining <= 0:
+            return
+
+        now = time.monotonic()
+        if len(self._payloads) >= TOKEN_CACHE_MAX_SIZE:
+            self._payloads = {k: v for k, v in self._payloads.items() if v[1] > now}
+            if len(self._payloads) >= TOKEN_CACHE_MAX_SIZE:
+                # Still full: drop the oldest entry
+                del self._payloads[next(iter(self._payloads))]
+        self._payloads[digest] = (payload, now + min(TOKEN_CACHE_TTL, remaining))
+
+    async def _verify_signature(self, token: str) -> Dict[str, Any]:
+        """Check the token's signature and claims against Keycloak's keys."""
+
+        signing_key = await self._get_signing_key(token)
+
+        # A single signature check; the audience is compared afterwards so an
+        # unexpected audience does not cost a second decode
         try:
-            if self._audience:
-                return _decode(verify_audience=True)
-            return _decode(verify_audience=False)
-        except InvalidAudienceError:
-            logging.getLogger(__name__).warning(
-                "JWT received sans claim 'aud' ou audience inattendue. Validation poursuivie sans contrôle d'audience."
-            )
-            return _decode(verify_audience=False)
-        except InvalidTokenError as exc:  # pragma: no cover - defensive
+            payload = jwt.decode(token, key=signing_key.key, **self._decode_kwargs)
+        except InvalidTokenError as exc:
             raise HTTPException(status_code=401, detail="Invalid authorization token") from exc
 
+        if self._audience:
+            audience = payload["aud"]
+            audiences = [audience] if isinstance(audience, str) else audience
+            if self._audience not in audiences:
+                logging.getLogger(__name__).warning(
+                    "JWT reçu avec une audience inattendue (%s). Validation poursuivie sans contrôle d'audience.", audience
+                )
+        return payload
+
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_token_verifier() -> KeycloakTokenVerifier:
     """Create a cached token verifier instance."""
 
@@ -80,22 +143,34 @@ def get_token_verifier() -> KeycloakTokenVerifier:
     )
 
 
-http_bearer = HTTPBearer(auto_error=False)
+async def authenticate_request(request: Request) -> Dict[str, Any]:
+    """Verify the request's bearer token and store its payload on ``request.state``."""
 
-
-async def require_keycloak_token(
-    request: Request, credentials: HTTPAuthorizationCredentials = Security(http_bearer)
-) -> Dict[str, Any]:
-    """FastAPI dependency enforcing Keycloak JWT validation for every endpoint."""
-
-
-    if credentials is None or not credentials.credentials:
+    authorization = request.headers.get("authorization")
+    if not authorization or authorization[:7].lower() != "bearer " or not authorization[7:]:
         raise HTTPException(status_code=401, detail="Authorization header missing")
+    token = authorization[7:]
 
-    token = credentials.credentials
-    payload = get_token_verifier().verify(token)
+    payload = await get_token_verifier().verify(token)
 
     request.state.token_payload = payload
     request.state.user_id = payload.get("sub")
 
     return payload
+
+
+async def require_keycloak_token(request: Request) -> Dict[str, Any]:
+    """FastAPI dependency enforcing Keycloak JWT validation for every endpoint.
+
+    A token sent with the request is normally verified once by the
+    authentication middleware, before rate limiting; the dependency then only
+    returns the stored payload, or raises the error the middleware recorded.
+    """
+
+    payload = getattr(request.state, "token_payload", None)
+    if payload is not None:
+        return payload
+    auth_error = getattr(request.state, "auth_error", None)
+    if auth_error is not None:
+        raise auth_error
+    return await authenticate_request(request)
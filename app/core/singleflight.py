@@ -0,0 +1,33 @@
+"""Coalesce concurrent identical upstream calls (single-flight)."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Run at most one call per key at a time.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same result (or exception) instead of starting their
+    own. The key is forgotten once the call completes, so nothing is cached.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``call()``, sharing it with concurrent callers of ``key``."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
@@ -1,54 +1,136 @@
 """Rail Traffic Analytics FastAPI entrypoint."""
 
+import asyncio
 import logging
+import sys
 import time
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
 from app.api.routes import api_router
+from app.api.routes.departements import fetch_departements, remember_departements
+from app.core.cache import close_redis
 from app.core.config import get_settings
 from app.core.rate_limit import limiter, rate_limit_exceeded_handler
-from app.core.database import SessionLocal, init_db
-from app.models.db import RequestLog
+from app.core.request_log import get_request_log_writer
+from app.core.security import OPENAPI_SECURITY_SCHEMES, authenticate_request
+from app.core.database import (
+    AsyncSessionLocal, async_engine, init_db, refresh_network_overview_while_leader
+)
+from app.services.navitia_service import get_navitia_service
 
 logger = logging.getLogger(__name__)
 
+# Documentation and browser noise, not worth a request log row
+UNLOGGED_PATHS = frozenset({"/", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json", "/favicon.ico"})
+
+
+async def refresh_network_overview_forever(interval: float) -> None:
+    """Keep the /stats/overview materialized view fresh while the app runs.
+
+    Only the worker holding the refresh lock refreshes; the others try to take
+    it over every ``interval`` seconds, e.g. after that worker stops.
+    """
+
+    while True:
+        try:
+            await refresh_network_overview_while_leader(interval)
+        except Exception:  # pragma: no cover - retried on the next tick
+            logger.exception("Failed to refresh network overview")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm in-process caches on startup and release pooled resources on shutdown."""
+
+    try:
+        async with AsyncSessionLocal() as db:
+            departements = await fetch_departements(db)
+        remember_departements(app, departements)
+    except Exception:  # pragma: no cover - the route falls back to the database
+        logger.exception("Failed to preload departements")
+
+    log_writer = get_request_log_writer()
+    log_writer.start()
+    refresher = asyncio.create_task(
+        refresh_network_overview_forever(get_settings().NETWORK_OVERVIEW_REFRESH_SECONDS)
+    )
+
+    yield
+    refresher.cancel()
+    with suppress(asyncio.CancelledError):
+        await refresher
+    await log_writer.stop()
+    await get_navitia_service().aclose()
+    await close_redis()
+    await async_engine.dispose()
+
 
 def create_application() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(title=settings.API_TITLE, version=settings.API_VERSION)
+    app = FastAPI(
+        title=settings.API_TITLE,
+        version=settings.API_VERSION,
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
 
     init_db()
 
+    # Authentication is enforced by a middleware rather than a security
+    # dependency, so the bearer scheme is added to the schema explicitly
+    default_openapi = app.openapi
+
+    def openapi() -> dict:
+        if app.openapi_schema is None:
+            schema = default_openapi()
+            schema.setdefault("components", {})["securitySchemes"] = OPENAPI_SECURITY_SCHEMES
+            schema["security"] = [{"HTTPBearer": []}]
+        return app.openapi_schema
+
+    app.openapi = openapi
+
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
     app.add_middleware(SlowAPIMiddleware)
 
+    @app.middleware("http")
+    async def authenticate(request: Request, call_next):
+        # A token sent with the request is verified once, before rate limiting,
+        # so the rate-limit key is the user id. Rejection is left to the routes
+        # depending on require_keycloak_token: unknown paths still answer 404
+        # and public routes stay reachable.
+        if "authorization" in request.headers:
+            try:
+                await authenticate_request(request)
+            except HTTPException as exc:
+                request.state.auth_error = exc
+        return await call_next(request)
+
     @app.middleware("http")
     async def log_requests(request: Request, call_next):
-        start_time = time.perf_counter()
-        response = await call_next(request)
-        duration_ms = int((time.perf_counter() - start_time) * 1000)
+        if request.url.path in UNLOGGED_PATHS:
+            return await call_next(request)
 
-        session = SessionLocal()
-        try:
-            log_entry = RequestLog(
-                method=request.method,
-                path=request.url.path,
-                user_id=getattr(request.state, "user_id", None),
-                status_code=response.status_code,
-                duration_ms=duration_ms,
-            )
-            session.add(log_entry)
-            session.commit()
-        except Exception:  # pragma: no cover - defensive logging
-            session.rollback()
-            logger.exception("Failed to persist request log")
-        finally:
-            session.close()
+        start_ns = time.monotonic_ns()
+        response = await call_next(request)
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
+
+        # Buffered in memory and inserted in batches by a background task
+        get_request_log_writer().record(
+            # One shared string per HTTP verb across the buffered rows; paths
+            # are client-controlled and deliberately not interned
+            method=sys.intern(request.method),
+            path=request.url.path,
+            user_id=getattr(request.state, "user_id", None),
+            status_code=response.status_code,
+            duration_ms=duration_ms,
+        )
 
         return response
 
@@ -1,28 +1,44 @@
 """Relational database models."""
 
-from datetime import datetime, timezone
-
-from sqlalchemy import Column, DateTime, Integer, String, Float, Boolean, Text, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, Float, Boolean, Text, ForeignKey, Index, column, func, table
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
 
 
+class CreatedAtMixin:
+    """Insertion timestamp filled by PostgreSQL."""
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class TimestampMixin(CreatedAtMixin):
+    """Insertion and last-update timestamps, both rendered as SQL NOW()."""
+
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
 class RequestLog(Base):
     """Store each API call for auditing and analytics."""
 
     __tablename__ = "request_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     method = Column(String(10), nullable=False)
     path = Column(String(255), nullable=False)
     user_id = Column(String(128), nullable=True)
     status_code = Column(Integer, nullable=False)
     duration_ms = Column(Integer, nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Analyses par utilisateur ou par route sur une période
+        Index("idx_request_logs_user_created", "user_id", "created_at"),
+        Index("idx_request_logs_path_status_created", "path", "status_code", "created_at"),
+    )
 
 
-class Region(Base):
+class Region(TimestampMixin, Base):
     """French regions."""
 
     __tablename__ = "regions"
@@ -30,14 +46,12 @@ class Region(Base):
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(10), unique=True, nullable=False, index=True)
     nom = Column(String(255), nullable=False, index=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relations
     departements = relationship("Departement", back_populates="region")
 
 
-class Departement(Base):
+class Departement(TimestampMixin, Base):
     """French departments."""
 
     __tablename__ = "departements"
@@ -46,14 +60,12 @@ class Departement(Base):
     code = Column(String(10), unique=True, nullable=False, index=True)
     nom = Column(String(255), nullable=False, index=True)
     region_code = Column(String(10), ForeignKey("regions.code"), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relations
     region = relationship("Region", back_populates="departements")
 
 
-class Station(Base):
+class Station(TimestampMixin, Base):
     """Railway stations (gares SNCF)."""
 
     __tablename__ = "stations"
@@ -68,14 +80,32 @@ class Station(Base):
     is_active = Column(Boolean, default=True)
     has_freight = Column(Boolean, default=False)
     has_passengers = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relations - No FK to departement since API returns names not codes
     delay_stats = relationship("StationDelayStat", back_populates="station")
 
-
-class Line(Base):
+    # Covering index for the station list: filter by departement, sort by name
+    # and serve the projected columns from the index alone.
+    __table_args__ = (
+        Index(
+            "idx_stations_dept_name",
+            "departement_code",
+            "name",
+            postgresql_include=["uic_code", "commune", "latitude", "longitude", "is_active"],
+        ),
+        # Keyset pagination order for the station list
+        Index("idx_stations_name_uic", "name", "uic_code"),
+        # Trigram index for the leading-wildcard ILIKE name search (needs pg_trgm)
+        Index(
+            "idx_stations_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
+
+class Line(TimestampMixin, Base):
     """Railway lines."""
 
     __tablename__ = "lines"
@@ -84,18 +114,31 @@ class Line(Base):
     line_code = Column(String(200), unique=True, nullable=False, index=True)
     name = Column(String(255), nullable=False, index=True)
     network = Column(String(100), nullable=True)
+    operator = Column(String(100), nullable=False, server_default="SNCF")  # network, "SNCF" if unknown
+    transport_mode = Column(String(20), nullable=True)  # TransportMode value
     color = Column(String(7), nullable=True)  # Hex color
     text_color = Column(String(7), nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relations
     trains = relationship("Train", back_populates="line")
     line_stats = relationship("LineStat", back_populates="line")
 
-
-class Train(Base):
+    # Keyset pagination order for the line list, which only returns active
+    # lines; the second index serves the transport_mode filter
+    __table_args__ = (
+        Index("idx_lines_active_name_code", "name", "line_code", postgresql_where=is_active),
+        Index(
+            "idx_lines_active_mode_name_code",
+            "transport_mode",
+            "name",
+            "line_code",
+            postgresql_where=is_active,
+        ),
+    )
+
+
+class Train(TimestampMixin, Base):
     """Trains in circulation."""
 
     __tablename__ = "trains"
@@ -110,18 +153,22 @@ class Train(Base):
     status = Column(String(50), nullable=True)  # on_time, delayed, cancelled
     delay_minutes = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relations
     line = relationship("Line", back_populates="trains")
 
+    # Active trains and their delays: lets mv_network_overview be computed
+    # with an index-only scan
+    __table_args__ = (
+        Index("idx_trains_active_delay", "delay_minutes", postgresql_where=is_active),
+    )
+
 
 # NOTE: Incidents/Disruptions are fetched directly from Navitia API in real-time
 # No database model needed for incidents
 
 
-class StationDelayStat(Base):
+class StationDelayStat(CreatedAtMixin, Base):
     """Delay statistics by station."""
 
     __tablename__ = "station_delay_stats"
@@ -133,13 +180,12 @@ class StationDelayStat(Base):
     delayed_trains = Column(Integer, default=0)
     average_delay_minutes = Column(Float, default=0.0)
     max_delay_minutes = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     # Relations
     station = relationship("Station", back_populates="delay_stats")
 
 
-class LineStat(Base):
+class LineStat(CreatedAtMixin, Base):
     """Performance statistics by line."""
 
     __tablename__ = "line_stats"
@@ -153,7 +199,96 @@ class LineStat(Base):
     cancelled_trains = Column(Integer, default=0)
     punctuality_rate = Column(Float, default=0.0)  # Percentage
     average_delay_minutes = Column(Float, default=0.0)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     # Relations
     line = relationship("Line", back_populates="line_stats")
+
+
+# Columns and indexes added after the first release. create_all() never alters
+# an existing table nor adds indexes to it, so init_db() runs these idempotent
+# statements as well (same as init-db.sql for databases set up by hand). Only
+# schema changes run here: operator and transport_mode values are filled by
+# the sync script.
+SCHEMA_UPGRADE_DDL = (
+    "ALTER TABLE lines ADD COLUMN IF NOT EXISTS transport_mode VARCHAR(20)",
+    "ALTER TABLE lines ADD COLUMN IF NOT EXISTS operator VARCHAR(100) NOT NULL DEFAULT 'SNCF'",
+    # The transport_mode filter is served by idx_lines_active_mode_name_code
+    "DROP INDEX IF EXISTS ix_lines_transport_mode",
+    "DROP INDEX IF EXISTS idx_lines_transport_mode",
+    # created_at used to be filled in Python, so tables created by create_all()
+    # before the server default was introduced have no column default
+    *(
+        f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()"
+        for table in (
+            "request_logs", "regions", "departements", "stations",
+            "lines", "trains", "station_delay_stats", "line_stats",
+        )
+    ),
+    # Keyset pagination of the list endpoints
+    "CREATE INDEX IF NOT EXISTS idx_stations_dept_name ON stations (departement_code, name) "
+    "INCLUDE (uic_code, commune, latitude, longitude, is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_stations_name_uic ON stations (name, uic_code)",
+    # Substring search on station names (pg_trgm is created beforehand)
+    "CREATE INDEX IF NOT EXISTS idx_stations_name_trgm ON stations USING gin (name gin_trgm_ops)",
+    "DROP INDEX IF EXISTS idx_lines_name_code",
+    "CREATE INDEX IF NOT EXISTS idx_lines_active_name_code ON lines (name, line_code) WHERE is_active",
+    "CREATE INDEX IF NOT EXISTS idx_lines_active_mode_name_code "
+    "ON lines (transport_mode, name, line_code) WHERE is_active",
+    # Delay aggregates of the stats endpoint, over active trains only
+    "CREATE INDEX IF NOT EXISTS idx_trains_active_delay ON trains (delay_minutes) WHERE is_active",
+    # Request log analytics; the first index covers the former user_id one
+    "DROP INDEX IF EXISTS idx_request_logs_user_id",
+    "CREATE INDEX IF NOT EXISTS idx_request_logs_user_created ON request_logs (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_request_logs_path_status_created "
+    "ON request_logs (path, status_code, created_at)",
+)
+
+
+# Materialized view backing GET /stats/overview. It is refreshed in the
+# background; the unique index on the constant ``id`` column is what allows
+# REFRESH ... CONCURRENTLY, so readers are never blocked. ``refreshed_at`` is
+# the time of the last refresh, i.e. how fresh the figures are.
+NETWORK_OVERVIEW_DDL = (
+    # IF NOT EXISTS keeps a view created before refreshed_at was added: drop it
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_matviews WHERE matviewname = 'mv_network_overview'
+        ) AND NOT EXISTS (
+            SELECT 1
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            WHERE c.relname = 'mv_network_overview' AND a.attname = 'refreshed_at'
+        ) THEN
+            DROP MATERIALIZED VIEW mv_network_overview;
+        END IF;
+    END
+    $$
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS mv_network_overview AS
+    SELECT
+        1 AS id,
+        (SELECT count(*) FROM stations WHERE is_active) AS total_stations,
+        (SELECT count(*) FROM lines WHERE is_active) AS total_lines,
+        count(*) AS active_trains,
+        count(*) FILTER (WHERE delay_minutes > 0) AS delayed_trains,
+        coalesce(avg(delay_minutes) FILTER (WHERE delay_minutes > 0), 0) AS avg_delay,
+        now() AS refreshed_at
+    FROM trains
+    WHERE is_active
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_network_overview_id ON mv_network_overview (id)",
+)
+REFRESH_NETWORK_OVERVIEW_SQL = "REFRESH MATERIALIZED VIEW CONCURRENTLY mv_network_overview"
+
+network_overview = table(
+    "mv_network_overview",
+    column("total_stations"),
+    column("total_lines"),
+    column("active_trains"),
+    column("delayed_trains"),
+    column("avg_delay"),
+    column("refreshed_at"),
+)
@@ -81,6 +81,7 @@ class StationDetail(Station):
 class StationList(BaseModel):
     stations: List[Station]
     total: int
+    next_cursor: Optional[str] = None
 
 
 class DelayInfo(BaseModel):
@@ -128,6 +129,12 @@ class LineDetail(Line):
 class LineList(BaseModel):
     lines: List[Line]
     total: int
+    next_cursor: Optional[str] = None
+
+
+class LineStatsBatchRequest(BaseModel):
+    """Lines to compute statistics for in a single call."""
+    line_ids: List[str] = Field(..., min_length=1, max_length=50)
 
 
 class LineStats(BaseModel):
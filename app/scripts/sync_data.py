@@ -1,21 +1,43 @@
 """Script to synchronize data from external APIs to PostgreSQL database."""
 
+import asyncio
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
 
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import func, select, text, update
+from urllib3.util.retry import Retry
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from app.core.cache import close_redis, invalidate_cache
 from app.core.database import SessionLocal, init_db
-from app.models.db import Region, Departement, Station, Line, Train
+from app.models.db import REFRESH_NETWORK_OVERVIEW_SQL, Region, Departement, Station, Line, Train
 from app.services.opendatasoft_service import get_opendatasoft_service
 from app.services.opendata_service import get_opendata_service
 from app.services.navitia_service import get_navitia_service
+from app.services.transport_mode import classify_transport_mode
+
+
+# SNCF "liste des gares" dataset, read page by page
+SNCF_STATIONS_URL = "https://data.sncf.com/api/explore/v2.1/catalog/datasets/liste-des-gares/records"
+STATIONS_PAGE_SIZE = 100
+# Above this many stations, rows are staged with COPY instead of a multi-row INSERT
+STATIONS_COPY_THRESHOLD = 1024
+# Station columns refreshed when a synced station already exists
+STATION_UPDATE_COLUMNS = (
+    "name", "commune", "departement_code", "latitude", "longitude", "has_freight", "has_passengers"
+)
 
 
 class DataSynchronizer:
@@ -26,6 +48,57 @@ class DataSynchronizer:
         self.opendata_service = get_opendata_service()
         self.navitia_service = get_navitia_service()
         self.opendatasoft_service = get_opendatasoft_service()
+        # One keep-alive session for the paginated SNCF dataset: a single TLS
+        # handshake for every page. Throttling and server errors are retried
+        # with backoff here; timeouts are retried by sync_stations itself.
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=3, connect=0, read=0, backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                raise_on_status=False,
+            ),
+        ))
+
+    def _upsert(self, model, rows: List[Dict[str, Any]], key: str, update: Iterable[str]) -> None:
+        """Insert ``rows`` in one statement, updating the ``update`` columns of existing rows.
+
+        Rows are matched on the unique column ``key`` (INSERT ... ON CONFLICT DO
+        UPDATE), so no per-row SELECT is needed; ``rows`` must not repeat a key.
+        """
+        if not rows:
+            return
+        stmt = pg_insert(model.__table__)
+        set_ = {name: stmt.excluded[name] for name in update}
+        set_["updated_at"] = func.now()
+        self.db.execute(stmt.on_conflict_do_update(index_elements=[key], set_=set_), rows)
+
+    def _store_stations(self, rows: List[Dict[str, Any]]) -> None:
+        """Upsert synced stations, going through COPY for large loads.
+
+        Large loads are streamed with COPY into a temporary table, then merged
+        into ``stations`` with a single INSERT ... SELECT ... ON CONFLICT.
+        """
+        if len(rows) <= STATIONS_COPY_THRESHOLD:
+            self._upsert(Station, rows, key="uic_code", update=STATION_UPDATE_COLUMNS)
+            return
+
+        columns = ", ".join(rows[0])
+        self.db.execute(text(
+            f"CREATE TEMP TABLE stations_stage ON COMMIT DROP AS SELECT {columns} FROM stations WITH NO DATA"
+        ))
+        with self.db.connection().connection.cursor() as cursor:
+            with cursor.copy(f"COPY stations_stage ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(tuple(row.values()))
+
+        updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in STATION_UPDATE_COLUMNS)
+        self.db.execute(text(
+            f"INSERT INTO stations ({columns}) SELECT {columns} FROM stations_stage "
+            f"ON CONFLICT (uic_code) DO UPDATE SET {updates}, updated_at = now()"
+        ))
 
     def sync_regions(self) -> int:
         """Sync regions from OpenDataSoft."""
@@ -33,8 +106,9 @@ class DataSynchronizer:
         
         try:
             regions_data = self.opendatasoft_service.get_regions()
-            count = 0
 
+            # Keyed by code: the last occurrence wins, as with successive updates
+            rows: Dict[str, Dict[str, Any]] = {}
             for item in regions_data:
                 region_code = item.get("code")
                 region_name = item.get("nom")
@@ -42,20 +116,11 @@ class DataSynchronizer:
                 if not region_code or not region_name:
                     continue
 
-                # Check if region exists
-                stmt = select(Region).where(Region.code == region_code)
-                existing = self.db.execute(stmt).scalar_one_or_none()
-
-                if existing:
-                    existing.nom = region_name
-                    existing.updated_at = datetime.now(timezone.utc)
-                else:
-                    region = Region(code=region_code, nom=region_name)
-                    self.db.add(region)
-                
-                count += 1
+                rows[region_code] = {"code": region_code, "nom": region_name}
 
+            self._upsert(Region, list(rows.values()), key="code", update=["nom"])
             self.db.commit()
+            count = len(rows)
             print(f"   ✅ {count} regions synchronized")
             return count
 
@@ -70,35 +135,24 @@ class DataSynchronizer:
         
         try:
             dept_data = self.opendatasoft_service.get_departements()
-            count = 0
 
+            rows: Dict[str, Dict[str, Any]] = {}
             for item in dept_data:
                 dept_code = item.get("code")
                 dept_name = item.get("nom")
-                region_code = item.get("region_code")
 
                 if not dept_code or not dept_name:
                     continue
 
-                # Check if department exists
-                stmt = select(Departement).where(Departement.code == dept_code)
-                existing = self.db.execute(stmt).scalar_one_or_none()
-
-                if existing:
-                    existing.nom = dept_name
-                    existing.region_code = region_code
-                    existing.updated_at = datetime.now(timezone.utc)
-                else:
-                    dept = Departement(
-                        code=dept_code,
-                        nom=dept_name,
-                        region_code=region_code
-                    )
-                    self.db.add(dept)
-                
-                count += 1
+                rows[dept_code] = {
+                    "code": dept_code,
+                    "nom": dept_name,
+                    "region_code": item.get("region_code"),
+                }
 
+            self._upsert(Departement, list(rows.values()), key="code", update=["nom", "region_code"])
             self.db.commit()
+            count = len(rows)
             print(f"   ✅ {count} departments synchronized")
             return count
 
@@ -107,151 +161,106 @@ class DataSynchronizer:
             print(f"   ❌ Error syncing departments: {e}")
             return 0
 
-    def sync_stations(self, limit: int = 100, max_retries: int = 3) -> int:
-        """Sync stations from SNCF Open Data API v2.1 with retry logic."""
+    def _fetch_stations_page(self, offset: int, max_retries: int) -> Optional[Dict[str, Any]]:
+        """Fetch one page of the SNCF stations dataset, or None once retries are exhausted."""
+        params = {"limit": STATIONS_PAGE_SIZE, "offset": offset}
+
+        for attempt in range(1, max_retries + 1):
+            try:
+                # Augmenter le timeout à 60 secondes
+                response = self._http.get(SNCF_STATIONS_URL, params=params, timeout=60)
+                response.raise_for_status()
+                return orjson.loads(response.content)
+
+            except requests.exceptions.Timeout:
+                if attempt < max_retries:
+                    wait_time = attempt * 5  # Backoff: 5s, 10s, 15s
+                    print(f"   ⚠️  Timeout at offset {offset}, retry {attempt}/{max_retries} in {wait_time}s...")
+                    time.sleep(wait_time)
+
+            except Exception as e:
+                print(f"   ❌ Error at offset {offset}: {e}")
+                if attempt < max_retries:
+                    time.sleep(attempt * 2)
+
+        print(f"   ⚠️  Skipping batch at offset {offset}")
+        return None
+
+    def sync_stations(self, limit: int = 100, max_retries: int = 3, max_workers: int = 4) -> int:
+        """Sync stations from SNCF Open Data API v2.1 with retry logic.
+
+        The first page gives ``total_count``; the remaining pages are then
+        fetched concurrently by ``max_workers`` threads, while rows are built and
+        written from this thread only (the session is not shared).
+        """
         print("🚉 Synchronizing stations...")
         
         try:
-            import requests
-            import time
-            
             count = 0
-            offset = 0
-            batch_size = 100
             seen_uic_codes = set()  # Track UIC codes to avoid duplicates
+            rows: List[Dict[str, Any]] = []  # Written in one go once every page is read
             consecutive_errors = 0
             max_consecutive_errors = 5
-            
-            while True:
-                retry_count = 0
-                success = False
-                no_more_data = False
-                
-                while retry_count < max_retries and not success:
-                    try:
-                        # Use the new SNCF API v2.1
-                        url = f"https://data.sncf.com/api/explore/v2.1/catalog/datasets/liste-des-gares/records"
-                        params = {
-                            "limit": batch_size,
-                            "offset": offset
-                        }
-                        
-                        # Augmenter le timeout à 60 secondes
-                        response = requests.get(url, params=params, timeout=60)
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        results = data.get("results", [])
-                        if not results:
-                            print(f"   ℹ️  No more results at offset {offset}")
-                            no_more_data = True
-                            success = True
-                            break  # No more data
-                        
-                        batch_added = 0
-                        for item in results:
-                            uic_code = item.get("code_uic")
-                            if not uic_code:
-                                continue
-                            
-                            # Skip if we've already seen this UIC code
-                            if uic_code in seen_uic_codes:
-                                continue
-                            seen_uic_codes.add(uic_code)
-
-                            name = item.get("libelle", "Unknown")
-                            commune = item.get("commune")
-                            dept_name = item.get("departemen")  # Note: "departemen" not "departement"
 
-                            # Coordinates from y_wgs84 (latitude) and x_wgs84 (longitude)
-                            latitude = item.get("y_wgs84")
-                            longitude = item.get("x_wgs84")
-
-                            # Check if station exists
-                            stmt = select(Station).where(Station.uic_code == uic_code)
-                            existing = self.db.execute(stmt).scalar_one_or_none()
-
-                            if existing:
-                                existing.name = name
-                                existing.commune = commune
-                                existing.departement_code = dept_name
-                                existing.latitude = latitude
-                                existing.longitude = longitude
-                                existing.has_freight = item.get("fret", "N") == "O"
-                                existing.has_passengers = item.get("voyageurs", "O") == "O"
-                                existing.updated_at = datetime.now(timezone.utc)
-                            else:
-                                station = Station(
-                                    uic_code=uic_code,
-                                    name=name,
-                                    commune=commune,
-                                    departement_code=dept_name,
-                                    latitude=latitude,
-                                    longitude=longitude,
-                                    has_freight=item.get("fret", "N") == "O",
-                                    has_passengers=item.get("voyageurs", "O") == "O",
-                                    is_active=True
-                                )
-                                self.db.add(station)
-                            
-                            batch_added += 1
-
-                        # Commit every batch
-                        self.db.commit()
-                        count += batch_added
-                        print(f"   ⏳ {count} stations processed...")
-                        
-                        offset += batch_size
-                        consecutive_errors = 0  # Reset error counter on success
-                        success = True
-                        
-                        # Check if we've reached the limit or all data
-                        total_count = data.get("total_count", 0)
-                        if offset >= total_count or (limit > 0 and count >= limit):
-                            break
-                        
-                        # Petit délai pour éviter de surcharger l'API
-                        time.sleep(0.1)
-                    
-                    except requests.exceptions.Timeout as e:
-                        retry_count += 1
+            first_page = self._fetch_stations_page(0, max_retries)
+            if first_page is None:
+                print("   ❌ Unable to fetch the first page, stopping sync")
+                return 0
+
+            total_count = first_page.get("total_count", 0)
+            if limit > 0:
+                total_count = min(total_count, limit)
+            offsets = range(STATIONS_PAGE_SIZE, total_count, STATIONS_PAGE_SIZE)
+
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                pages = executor.map(lambda offset: self._fetch_stations_page(offset, max_retries), offsets)
+                # Pages are consumed in offset order as they complete
+                for data in chain([first_page], pages):
+                    if data is None:
                         consecutive_errors += 1
-                        wait_time = retry_count * 5  # Backoff exponentiel: 5s, 10s, 15s
-                        
-                        if retry_count < max_retries:
-                            print(f"   ⚠️  Timeout at offset {offset}, retry {retry_count}/{max_retries} in {wait_time}s...")
-                            time.sleep(wait_time)
-                        else:
-                            print(f"   ❌ Max retries reached at offset {offset}, moving to next batch")
-                            # Essayer de passer au batch suivant
-                            offset += batch_size
-                            success = True  # Continue même après erreur
-                            
-                    except Exception as e:
-                        retry_count += 1
-                        consecutive_errors += 1
-                        print(f"   ❌ Error at offset {offset}: {e}")
-                        
-                        if retry_count < max_retries:
-                            time.sleep(retry_count * 2)
-                        else:
-                            print(f"   ⚠️  Skipping batch at offset {offset}")
-                            offset += batch_size
-                            success = True
-                
-                # Si plus de données, on sort de la boucle principale
-                if no_more_data:
-                    break
-                
-                # Si on a trop d'erreurs consécutives, on arrête complètement
-                if consecutive_errors >= max_consecutive_errors:
-                    print(f"   ⚠️  Too many consecutive errors ({consecutive_errors}), stopping sync")
-                    break
-                
-                # Si la dernière tentative a échoué et qu'on n'a pas avancé, on arrête
-                if not success:
-                    break
-
+                        # Si on a trop d'erreurs consécutives, on arrête complètement
+                        if consecutive_errors >= max_consecutive_errors:
+                            print(f"   ⚠️  Too many consecutive errors ({consecutive_errors}), stopping sync")
+                            break
+                        continue
+                    consecutive_errors = 0
+
+                    results = data.get("results", [])
+                    if not results:
+                        print("   ℹ️  No more results")
+                        break
+
+                    for item in results:
+                        uic_code = item.get("code_uic")
+                        if not uic_code:
+                            continue
+
+                        # Skip if we've already seen this UIC code
+                        if uic_code in seen_uic_codes:
+                            continue
+                        seen_uic_codes.add(uic_code)
+
+                        rows.append({
+                            "uic_code": uic_code,
+                            "name": item.get("libelle", "Unknown"),
+                            "commune": item.get("commune"),
+                            "departement_code": item.get("departemen"),  # Note: "departemen" not "departement"
+                            # Coordinates from y_wgs84 (latitude) and x_wgs84 (longitude)
+                            "latitude": item.get("y_wgs84"),
+                            "longitude": item.get("x_wgs84"),
+                            "has_freight": item.get("fret", "N") == "O",
+                            "has_passengers": item.get("voyageurs", "O") == "O",
+                            "is_active": True,  # Only set on insert
+                        })
+                        count += 1
+
+                    print(f"   ⏳ {count} stations processed...")
+            finally:
+                executor.shutdown(cancel_futures=True)
+
+            self._store_stations(rows)
+            self.db.commit()
             print(f"   ✅ {count} stations synchronized (unique: {len(seen_uic_codes)})")
             return count
 
@@ -268,48 +277,36 @@ class DataSynchronizer:
         
         try:
             lines_data = self.navitia_service.get_lines()
-            count = 0
-            seen_line_codes = set()  # Track line codes to avoid duplicates
+            rows: Dict[str, Dict[str, Any]] = {}
 
             for item in lines_data:
                 line_code = item.get("id")
-                if not line_code:
-                    continue
-                
-                # Skip if we've already seen this line code
-                if line_code in seen_line_codes:
+                # Skip lines without id, and duplicates (first occurrence wins)
+                if not line_code or line_code in rows:
                     continue
-                seen_line_codes.add(line_code)
 
                 name = item.get("name", "Unknown")
                 network = item.get("network", {}).get("name") if isinstance(item.get("network"), dict) else None
-                color = item.get("color")
-                text_color = item.get("text_color")
-
-                # Check if line exists
-                stmt = select(Line).where(Line.line_code == line_code)
-                existing = self.db.execute(stmt).scalar_one_or_none()
-
-                if existing:
-                    existing.name = name
-                    existing.network = network
-                    existing.color = color
-                    existing.text_color = text_color
-                    existing.updated_at = datetime.now(timezone.utc)
-                else:
-                    line = Line(
-                        line_code=line_code,
-                        name=name,
-                        network=network,
-                        color=color,
-                        text_color=text_color,
-                        is_active=True
-                    )
-                    self.db.add(line)
-                
-                count += 1
 
+                rows[line_code] = {
+                    "line_code": line_code,
+                    "name": name,
+                    "network": network,
+                    "operator": network or "SNCF",
+                    "transport_mode": classify_transport_mode(network, name).value,
+                    "color": item.get("color"),
+                    "text_color": item.get("text_color"),
+                    "is_active": True,  # Only set on insert
+                }
+
+            self._upsert(
+                Line,
+                list(rows.values()),
+                key="line_code",
+                update=["name", "network", "operator", "transport_mode", "color", "text_color"],
+            )
             self.db.commit()
+            count = len(rows)
             print(f"   ✅ {count} lines synchronized")
             return count
 
@@ -318,6 +315,64 @@ class DataSynchronizer:
             print(f"   ❌ Error syncing lines: {e}")
             return 0
 
+    def backfill_transport_modes(self) -> int:
+        """Classify lines stored before the transport_mode column existed."""
+        print("🏷️  Backfilling line transport modes...")
+
+        try:
+            # Streamed in batches of plain rows, each written back with one
+            # bulk UPDATE by primary key (no ORM objects nor unit of work)
+            stmt = (
+                select(Line.id, Line.network, Line.name)
+                .where(Line.transport_mode.is_(None))
+                .execution_options(yield_per=500)
+            )
+            count = 0
+            for batch in self.db.execute(stmt).partitions():
+                self.db.execute(update(Line), [
+                    {"id": line_id, "transport_mode": classify_transport_mode(network, name).value}
+                    for line_id, network, name in batch
+                ])
+                count += len(batch)
+
+            self.db.commit()
+            print(f"   ✅ {count} lines classified")
+            return count
+
+        except Exception as e:
+            self.db.rollback()
+            print(f"   ❌ Error backfilling transport modes: {e}")
+            return 0
+
+    def refresh_network_overview(self) -> bool:
+        """Recompute the /stats/overview materialized view from the synced tables."""
+        print("📈 Refreshing network overview...")
+
+        try:
+            self.db.execute(text(REFRESH_NETWORK_OVERVIEW_SQL))
+            self.db.commit()
+            print("   ✅ Network overview refreshed")
+            return True
+
+        except Exception as e:
+            self.db.rollback()
+            print(f"   ❌ Error refreshing network overview: {e}")
+            return False
+
+    def invalidate_api_cache(self) -> int:
+        """Drop cached API responses built from the data just synchronized."""
+        print("🧹 Invalidating API response cache...")
+
+        async def _invalidate() -> int:
+            try:
+                return await invalidate_cache("regions:", "departements:", "stations:", "lines:")
+            finally:
+                await close_redis()
+
+        count = asyncio.run(_invalidate())
+        print(f"   ✅ {count} cached responses removed")
+        return count
+
     # NOTE: Incidents/Disruptions are fetched directly from Navitia API in real-time
     # No sync needed - routes will query the API directly
 
@@ -333,8 +388,11 @@ class DataSynchronizer:
             "regions": self.sync_regions(),
             "departements": self.sync_departements(),
             "stations": self.sync_stations(limit=0),  # 0 = no limit, get all stations
-            "lines": self.sync_lines()
+            "lines": self.sync_lines(),
+            "line modes": self.backfill_transport_modes()
         }
+        self.refresh_network_overview()
+        self.invalidate_api_cache()
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
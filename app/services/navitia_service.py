@@ -1,23 +1,69 @@
 """Navitia.io API service for real-time transport data."""
 
+import asyncio
 from functools import lru_cache
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+from urllib.parse import quote
 from datetime import datetime, timedelta
 
+import httpx
+import orjson
 import requests
+from async_lru import alru_cache
+from requests.adapters import HTTPAdapter
 
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import get_settings
 
 
+def parse_navitia_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Navitia ``YYYYMMDDTHHMMSS`` timestamp, or return None if invalid.
+
+    The compact Navitia format is sliced by hand, which is much cheaper than
+    ``strptime``; ISO 8601 strings are still accepted as a fallback.
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 15 and value[8] == "T":
+            return datetime(
+                int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                int(value[9:11]), int(value[11:13]), int(value[13:15]),
+            )
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _impacted_stop_names(disruption: Dict[str, Any]) -> set:
+    """Return the lowercased names of the stop areas/points a disruption impacts."""
+    names = set()
+    for impacted in disruption.get("impacted_objects", []):
+        pt_object = impacted.get("pt_object", {})
+        embedded_type = pt_object.get("embedded_type")
+        if embedded_type == "stop_area" or embedded_type == "stop_point":
+            name = pt_object.get(embedded_type, {}).get("name")
+            if name:
+                names.add(name.lower())
+    return names
+
+
 class NavitiaService:
     """Fetches real-time transport data from Navitia.io API."""
 
     def __init__(self, base_url: str, api_key: Optional[str], timeout: float) -> None:
         self._base_url = base_url.rstrip("/")
         self._timeout = timeout
+        self._api_key = api_key
         self._session = requests.Session()
+        # Sync calls run concurrently in worker threads: keep as many pooled
+        # connections as the async client instead of the default 10
+        self._session.mount("https://", HTTPAdapter(pool_maxsize=20))
         if api_key:
             self._session.auth = (api_key, "")
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # Fail fast while Navitia is down instead of waiting for each timeout
+        self._breaker = CircuitBreaker("navitia", fail_max=5, reset_timeout=30)
 
     def _build_url(self, endpoint: str) -> str:
         """Build full URL for Navitia endpoint."""
@@ -26,45 +72,157 @@ class NavitiaService:
     def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Perform a GET request against Navitia API."""
         url = self._build_url(endpoint)
-        response = self._session.get(url, params=params, timeout=self._timeout)
+        self._breaker.before_call()
+        try:
+            response = self._session.get(url, params=params, timeout=self._timeout)
+        except requests.RequestException:
+            self._breaker.record_failure()
+            raise
+        self._record_status(response.status_code)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
+
+    def _record_status(self, status_code: int) -> None:
+        """Count server errors as breaker failures; any other answer closes it."""
+        if status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
 
-    def get_disruptions(self, region: str = "sncf") -> List[Dict[str, Any]]:
-        """Get ALL disruptions/alerts on the network (paginated)."""
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the shared keep-alive async client, creating it on first use."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self._base_url,
+                auth=(self._api_key, "") if self._api_key else None,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=20, max_keepalive_connections=20, keepalive_expiry=60
+                ),
+            )
+        return self._async_client
+
+    async def aget(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Perform a GET request against Navitia API without blocking the event loop."""
+        self._breaker.before_call()
         try:
-            all_disruptions = []
-            start_page = 0
-            count_per_page = 100  # Navitia max per page
+            response = await self._get_async_client().get(f"/{endpoint.lstrip('/')}", params=params)
+        except httpx.HTTPError:
+            self._breaker.record_failure()
+            raise
+        self._record_status(response.status_code)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    async def aclose(self) -> None:
+        """Close the async client and its pooled connections."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def fetch_disruptions(
+        self,
+        region: str = "sncf",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get ALL disruptions/alerts on the network (paginated).
+
+        ``since``/``until`` are forwarded to Navitia so that only disruptions
+        applicable within that window are returned. Unlike ``get_disruptions``,
+        upstream errors are propagated so callers can fall back to a previously
+        cached copy.
+        """
+        all_disruptions = []
+        start_page = 0
+        count_per_page = 100  # Navitia max per page
+
+        window: Dict[str, Any] = {}
+        if since:
+            window["since"] = since.strftime("%Y%m%dT%H%M%S")
+        if until:
+            window["until"] = until.strftime("%Y%m%dT%H%M%S")
+        
+        while True:
+            params = {"start_page": start_page, "count": count_per_page, **window}
+            data = await self.aget(f"coverage/{region}/disruptions", params=params)
+            disruptions = data.get("disruptions", [])
             
-            while True:
-                params = {"start_page": start_page, "count": count_per_page}
-                data = self.get(f"coverage/{region}/disruptions", params=params)
-                disruptions = data.get("disruptions", [])
-                
-                if not disruptions:
-                    break  # No more disruptions
-                
-                all_disruptions.extend(disruptions)
-                
-                # Check pagination info
-                pagination = data.get("pagination", {})
-                total_result = pagination.get("total_result", 0)
-                
-                if len(all_disruptions) >= total_result:
-                    break  # Got all disruptions
-                
-                start_page += 1
+            if not disruptions:
+                break  # No more disruptions
+            
+            all_disruptions.extend(disruptions)
             
-            return all_disruptions
+            # Check pagination info
+            pagination = data.get("pagination", {})
+            total_result = pagination.get("total_result", 0)
+            
+            if len(all_disruptions) >= total_result:
+                break  # Got all disruptions
+            
+            start_page += 1
+        
+        return all_disruptions
+
+    async def get_disruptions(
+        self,
+        region: str = "sncf",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get ALL disruptions/alerts on the network, or an empty list on error.
+
+        Without a time window the result is served from a one-minute
+        in-process cache; disruptions change on the order of minutes.
+        """
+        try:
+            if since is None and until is None:
+                disruptions, _ = await self._get_recent_disruptions(region)
+                return disruptions
+            return await self.fetch_disruptions(region, since=since, until=until)
         except Exception:
             return []
 
-    def get_departures(self, station_id: str, count: int = 10) -> List[Dict[str, Any]]:
+    @alru_cache(maxsize=8, ttl=60)
+    async def _get_recent_disruptions(
+        self, region: str
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, List[int]]]:
+        """Full disruption scan of ``region`` and, per lowercased stop name, their positions.
+
+        The index is built from the same scan and cached with it, so its
+        positions always refer to that list. Errors propagate and are never cached.
+        """
+        disruptions = await self.fetch_disruptions(region)
+        by_stop: Dict[str, List[int]] = {}
+        for position, disruption in enumerate(disruptions):
+            for name in _impacted_stop_names(disruption):
+                by_stop.setdefault(name, []).append(position)
+        return disruptions, by_stop
+
+    async def get_disruptions_for_stop(self, stop_name: str, region: str = "sncf") -> List[Dict[str, Any]]:
+        """Get recent disruptions impacting a stop whose name contains ``stop_name``.
+
+        Matching is case-insensitive. The disruptions are indexed by impacted
+        stop name once per cache refresh, so a lookup scans the distinct stop
+        names instead of every impacted object. Returns an empty list on error.
+        """
+        try:
+            disruptions, by_stop = await self._get_recent_disruptions(region)
+        except Exception:
+            return []
+
+        needle = stop_name.lower()
+        positions = set()
+        for name, indices in by_stop.items():
+            if needle in name:
+                positions.update(indices)
+        return [disruptions[position] for position in sorted(positions)]
+
+    async def get_departures(self, station_id: str, count: int = 10) -> List[Dict[str, Any]]:
         """Get next departures from a station."""
         try:
             params = {"count": count, "data_freshness": "realtime"}
-            data = self.get(f"coverage/sncf/stop_areas/{station_id}/departures", params=params)
+            data = await self.aget(f"coverage/sncf/stop_areas/{station_id}/departures", params=params)
             return data.get("departures", [])
         except Exception:
             return []
@@ -115,24 +273,38 @@ class NavitiaService:
         except Exception:
             return []
 
-    def get_line_disruptions(self, line_id: str) -> List[Dict[str, Any]]:
+    async def get_line_disruptions(self, line_id: str) -> List[Dict[str, Any]]:
         """Get disruptions for a specific line."""
         try:
-            data = self.get(f"coverage/sncf/lines/{line_id}/disruptions")
+            # Quoted: a client-supplied id must not reach another path or the query string
+            data = await self.aget(f"coverage/sncf/lines/{quote(line_id, safe=':')}/disruptions")
             return data.get("disruptions", [])
         except Exception:
             return []
 
-    def get_line_routes(self, line_id: str) -> List[Dict[str, Any]]:
-        """Get routes (with stop points) for a specific line."""
-        try:
-            data = self.get(f"coverage/sncf/lines/{line_id}/routes")
-            return data.get("routes", [])
-        except Exception:
-            return []
+    async def get_disruptions_for_lines(self, line_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get disruptions for several lines, fetched concurrently.
+
+        Each line goes through ``get_line_disruptions``, so ids end up in the
+        request path rather than in a filter expression and lines are matched
+        exactly as for a single line. Lines without disruptions, or whose call
+        failed, map to an empty list.
+        """
+        results = await asyncio.gather(*(self.get_line_disruptions(line_id) for line_id in line_ids))
+        return dict(zip(line_ids, results))
+
+    @alru_cache(maxsize=2048, ttl=300)
+    async def get_line_routes(self, line_id: str) -> List[Dict[str, Any]]:
+        """Get routes (with stop points) for a specific line.
+
+        Results are kept in-process for five minutes per line. Upstream errors
+        are propagated, and therefore never cached.
+        """
+        data = await self.aget(f"coverage/sncf/lines/{line_id}/routes")
+        return data.get("routes", [])
 
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_navitia_service() -> NavitiaService:
     """Return a cached Navitia service instance."""
     settings = get_settings()
@@ -3,8 +3,10 @@
 from functools import lru_cache
 from typing import Any, Dict, Optional, List
 
+import orjson
 import requests
 
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import get_settings
 
 
@@ -17,6 +19,8 @@ class OpenDataService:
         self._session = requests.Session()
         if api_key and api_key not in (None, "", "your_opendata_token"):
             self._session.headers.update({"Authorization": f"apikey {api_key}"})
+        # Fail fast while the open data API is down instead of waiting for each timeout
+        self._breaker = CircuitBreaker("opendata", fail_max=5, reset_timeout=30)
 
     def _build_url(self, endpoint: str) -> str:
         return f"{self._base_url}/{endpoint.lstrip('/')}"
@@ -24,9 +28,18 @@ class OpenDataService:
     def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Perform a GET request against the open data API."""
         url = self._build_url(endpoint)
-        response = self._session.get(url, params=params, timeout=self._timeout)
+        self._breaker.before_call()
+        try:
+            response = self._session.get(url, params=params, timeout=self._timeout)
+        except requests.RequestException:
+            self._breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
 
     def get_stations(self, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
         """Fetch stations from liste-des-gares dataset."""
@@ -113,7 +126,7 @@ class OpenDataService:
             return {"results": [], "total_count": 0}
 
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_opendata_service() -> OpenDataService:
     """Return a cached OpenData service instance."""
     settings = get_settings()
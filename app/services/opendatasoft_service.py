@@ -3,6 +3,7 @@
 from functools import lru_cache
 from typing import Any, Dict, Optional, List
 
+import orjson
 import requests
 
 from app.core.config import get_settings
@@ -24,7 +25,7 @@ class OpenDataSoftService:
         url = self._build_url(endpoint)
         response = self._session.get(url, params=params, timeout=self._timeout)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
 
     def get_regions(self) -> List[Dict[str, Any]]:
         """Get French regions from OpenDataSoft."""
@@ -190,7 +191,7 @@ class OpenDataSoftService:
             return {"results": [], "total_count": 0}
 
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_opendatasoft_service() -> OpenDataSoftService:
     """Return a cached OpenDataSoft service instance."""
     settings = get_settings()
@@ -3,6 +3,7 @@
 from functools import lru_cache
 from typing import Any, Dict, Optional
 
+import orjson
 import requests
 
 from app.core.config import get_settings
@@ -41,10 +42,10 @@ class StationsDatasetService:
             timeout=self._timeout,
         )
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
 
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_stations_dataset_service() -> StationsDatasetService:
     """Return a cached dataset service instance."""
 
@@ -0,0 +1,40 @@
+"""Transport mode classification for railway lines."""
+
+import re
+from typing import Optional
+
+from app.models.schemas import TransportMode
+
+
+# Single pass over "network name"; TER must be a whole word so that
+# "INTERCITES" is not mistaken for a TER line.
+_MODE_PATTERN = re.compile(r"TGV|\bTER\b|INTERCIT[ÉE]S|TRANSILIEN", re.IGNORECASE)
+
+_MODE_BY_TOKEN = {
+    "TGV": TransportMode.TGV,
+    "TER": TransportMode.TER,
+    "INTERCITES": TransportMode.INTERCITES,
+    "INTERCITÉS": TransportMode.INTERCITES,
+    "TRANSILIEN": TransportMode.TRANSILIEN,
+}
+
+# When several tokens match, the first mode of this tuple wins
+_MODE_PRIORITY = (
+    TransportMode.TGV,
+    TransportMode.TER,
+    TransportMode.INTERCITES,
+    TransportMode.TRANSILIEN,
+)
+
+
+def classify_transport_mode(network: Optional[str], name: Optional[str]) -> TransportMode:
+    """Derive the transport mode of a line from its network and name."""
+    tokens = _MODE_PATTERN.findall(f"{network or ''} {name or ''}")
+    if not tokens:
+        return TransportMode.TRAIN
+
+    modes = {_MODE_BY_TOKEN[token.upper()] for token in tokens}
+    for mode in _MODE_PRIORITY:
+        if mode in modes:
+            return mode
+    return TransportMode.TRAIN
@@ -4,6 +4,9 @@
 -- Se connecter à la base rail_analytics
 \c rail_analytics
 
+-- Index trigrammes pour les recherches ILIKE '%...%'
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- ============================================================================
 -- TABLE: request_logs (logs d'API)
 -- ============================================================================
@@ -17,9 +20,13 @@ CREATE TABLE IF NOT EXISTS request_logs (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_request_logs_user_id ON request_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_request_logs_created_at ON request_logs(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_request_logs_status_code ON request_logs(status_code);
+-- Analyses par utilisateur ou par route sur une période (le premier remplace
+-- l'index simple sur user_id, dont il couvre les recherches)
+DROP INDEX IF EXISTS idx_request_logs_user_id;
+CREATE INDEX IF NOT EXISTS idx_request_logs_user_created ON request_logs(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_request_logs_path_status_created ON request_logs(path, status_code, created_at);
 
 -- ============================================================================
 -- TABLE: regions (Régions françaises)
@@ -73,6 +80,13 @@ CREATE INDEX IF NOT EXISTS idx_stations_uic_code ON stations(uic_code);
 CREATE INDEX IF NOT EXISTS idx_stations_name ON stations(name);
 CREATE INDEX IF NOT EXISTS idx_stations_departement ON stations(departement_code);
 CREATE INDEX IF NOT EXISTS idx_stations_active ON stations(is_active);
+-- Index couvrant pour la liste des gares (filtre département + tri par nom)
+CREATE INDEX IF NOT EXISTS idx_stations_dept_name ON stations(departement_code, name)
+    INCLUDE (uic_code, commune, latitude, longitude, is_active);
+-- Ordre de la pagination par curseur des gares
+CREATE INDEX IF NOT EXISTS idx_stations_name_uic ON stations(name, uic_code);
+-- Recherche par nom (ILIKE '%...%') : un B-tree ne sert pas, un index trigramme oui
+CREATE INDEX IF NOT EXISTS idx_stations_name_trgm ON stations USING gin (name gin_trgm_ops);
 
 -- ============================================================================
 -- TABLE: lines (Lignes ferroviaires)
@@ -82,6 +96,8 @@ CREATE TABLE IF NOT EXISTS lines (
     line_code VARCHAR(200) UNIQUE NOT NULL,
     name VARCHAR(255) NOT NULL,
     network VARCHAR(100),
+    operator VARCHAR(100) NOT NULL DEFAULT 'SNCF',
+    transport_mode VARCHAR(20),
     color VARCHAR(7),
     text_color VARCHAR(7),
     is_active BOOLEAN DEFAULT TRUE,
@@ -92,6 +108,19 @@ CREATE TABLE IF NOT EXISTS lines (
 CREATE INDEX IF NOT EXISTS idx_lines_code ON lines(line_code);
 CREATE INDEX IF NOT EXISTS idx_lines_name ON lines(name);
 CREATE INDEX IF NOT EXISTS idx_lines_active ON lines(is_active);
+-- Mode de transport précalculé (bases existantes : colonne ajoutée puis remplie
+-- par `python app/scripts/sync_data.py`)
+ALTER TABLE lines ADD COLUMN IF NOT EXISTS transport_mode VARCHAR(20);
+-- Le filtre par mode est servi par idx_lines_active_mode_name_code (ci-dessous)
+DROP INDEX IF EXISTS idx_lines_transport_mode;
+-- Opérateur normalisé à l'ingestion (réseau, 'SNCF' à défaut)
+ALTER TABLE lines ADD COLUMN IF NOT EXISTS operator VARCHAR(100) NOT NULL DEFAULT 'SNCF';
+UPDATE lines SET operator = network WHERE network IS NOT NULL AND operator <> network;
+-- Ordre de la pagination par curseur des lignes actives (index partiels :
+-- parcours d'index sans tri, avec ou sans filtre par mode)
+DROP INDEX IF EXISTS idx_lines_name_code;
+CREATE INDEX IF NOT EXISTS idx_lines_active_name_code ON lines(name, line_code) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_lines_active_mode_name_code ON lines(transport_mode, name, line_code) WHERE is_active;
 
 -- ============================================================================
 -- TABLE: trains (Trains en circulation)
@@ -115,6 +144,8 @@ CREATE INDEX IF NOT EXISTS idx_trains_number ON trains(train_number);
 CREATE INDEX IF NOT EXISTS idx_trains_line ON trains(line_code);
 CREATE INDEX IF NOT EXISTS idx_trains_status ON trains(status);
 CREATE INDEX IF NOT EXISTS idx_trains_departure ON trains(departure_time);
+-- Trains actifs et leurs retards : parcours d'index seul pour mv_network_overview
+CREATE INDEX IF NOT EXISTS idx_trains_active_delay ON trains(delay_minutes) WHERE is_active;
 
 -- ============================================================================
 -- NOTE: Incidents/Disruptions are fetched directly from Navitia API in real-time
@@ -155,6 +186,25 @@ CREATE TABLE IF NOT EXISTS line_stats (
 CREATE INDEX IF NOT EXISTS idx_line_stats_line ON line_stats(line_code);
 CREATE INDEX IF NOT EXISTS idx_line_stats_date ON line_stats(date);
 
+-- ============================================================================
+-- VUE MATÉRIALISÉE: mv_network_overview (GET /stats/overview)
+-- ============================================================================
+-- Rafraîchie par l'API (NETWORK_OVERVIEW_REFRESH_SECONDS) et après chaque
+-- synchronisation ; l'index unique permet REFRESH ... CONCURRENTLY
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_network_overview AS
+SELECT
+    1 AS id,
+    (SELECT count(*) FROM stations WHERE is_active) AS total_stations,
+    (SELECT count(*) FROM lines WHERE is_active) AS total_lines,
+    count(*) AS active_trains,
+    count(*) FILTER (WHERE delay_minutes > 0) AS delayed_trains,
+    coalesce(avg(delay_minutes) FILTER (WHERE delay_minutes > 0), 0) AS avg_delay,
+    now() AS refreshed_at
+FROM trains
+WHERE is_active;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_network_overview_id ON mv_network_overview (id);
+
 -- ============================================================================
 -- MESSAGE DE CONFIRMATION
 -- ============================================================================
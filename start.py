@@ -1,4 +1,6 @@
 """Script de démarrage simple pour Rail Traffic Analytics."""
+import sys
+
 import uvicorn
 
 if __name__ == "__main__":
@@ -12,6 +14,8 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop indisponible sous Windows
+        http="httptools",
         log_level="info"
     )
 
@@ -1,5 +1,6 @@
 """Script de test pour vérifier que toutes les APIs sont accessibles."""
 
+import asyncio
 import sys
 from app.services.opendata_service import get_opendata_service
 from app.services.navitia_service import get_navitia_service
@@ -55,7 +56,7 @@ def test_navitia():
             print("   ⚠️  Navitia.io - Aucune ligne retournée (clé API manquante ?)")
 
         # Test des perturbations
-        disruptions = service.get_disruptions()
+        disruptions = asyncio.run(service.get_disruptions())
         print(f"   📡 Perturbations actives: {len(disruptions)}")
 
         return len(lines) > 0